@@ -7,7 +7,12 @@ function _resolveConfig() {
     'ssrPathsDirectory' => 'src/ssr',
     'buildFilesDirectory' => 'dist',
     'websiteTitle' => 'SPA with React Router and PHP',
-    'rewrites' => []
+    'rewrites' => [],
+    // Python recognition processes notified when users are removed
+    'recognitionServiceUrl' => 'http://localhost:5001',
+    // must match TECHNEST_SERVICE_TOKEN when the Flask server sets one
+    'recognitionServiceToken' => getenv('TECHNEST_SERVICE_TOKEN') ?: '',
+    'recognitionWorkerPort' => 5002
   ];
 
   // Fetch config file and add contents to $defaultConfig
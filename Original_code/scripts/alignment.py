@@ -0,0 +1,116 @@
+import math
+import os
+
+import cv2
+import numpy as np
+
+from embedding_store import MODEL_ID
+from landmarks import FrameLandmarks, LEFT_EYE, RIGHT_EYE
+
+
+# Faces are rotated so the eyes are level, scaled so they are a fixed distance
+# apart, and cropped straight to the FaceNet input size: the left eye centre
+# lands at (ALIGN_LEFT_EYE_X, ALIGN_EYE_Y) of the output, the right eye mirrored.
+# With eyes 32% of the crop apart the whole head plus ~12% margin fits.
+ALIGN_FACE_SIZE = 160
+ALIGN_LEFT_EYE_X = 0.34
+ALIGN_EYE_Y = 0.40
+
+# Where a Haar box puts the eyes, for faces without usable landmarks; framing
+# them the same way keeps fallback crops comparable to aligned ones
+BOX_EYE_X = (0.30, 0.70)
+BOX_EYE_Y = 0.38
+# Landmarks are ignored when the eyes are implausible for the box (predictor misfit)
+MIN_EYE_SPAN = 0.2
+MAX_EYE_SPAN = 0.8
+MAX_ROLL_DEG = 45.0
+
+# Templates and probes must use the same preprocessing, so aligned embeddings
+# carry their own model id and never mix with unaligned ones in the cache.
+ALIGN_FACES = os.environ.get("TECHNEST_ALIGN_FACES", "1") == "1"
+ALIGNED_MODEL_ID = f"{MODEL_ID}+aligned"
+
+
+def embedding_model_id(aligned=ALIGN_FACES):
+    return ALIGNED_MODEL_ID if aligned else MODEL_ID
+
+
+def eye_centers(points):
+    """``(left, right)`` eye centres (image left/right) from ``(68, 2)`` landmarks."""
+    points = np.asarray(points, dtype=np.float32)
+    return points[LEFT_EYE].mean(axis=0), points[RIGHT_EYE].mean(axis=0)
+
+
+def box_eye_centers(box):
+    x, y, w, h = box
+    left = np.array([x + BOX_EYE_X[0] * w, y + BOX_EYE_Y * h], dtype=np.float32)
+    right = np.array([x + BOX_EYE_X[1] * w, y + BOX_EYE_Y * h], dtype=np.float32)
+    return left, right
+
+
+def plausible_eyes(left, right, box):
+    dx, dy = right - left
+    span = math.hypot(dx, dy) / float(max(box[2], 1))
+    roll = abs(math.degrees(math.atan2(dy, dx)))
+    return dx > 0 and MIN_EYE_SPAN <= span <= MAX_EYE_SPAN and roll <= MAX_ROLL_DEG
+
+
+def alignment_matrix(left, right, size=ALIGN_FACE_SIZE):
+    """2x3 similarity transform that maps the eye centres onto their canonical positions."""
+    dx, dy = float(right[0] - left[0]), float(right[1] - left[1])
+    angle = math.degrees(math.atan2(dy, dx))
+    scale = (1.0 - 2.0 * ALIGN_LEFT_EYE_X) * size / max(math.hypot(dx, dy), 1e-6)
+    center = ((left[0] + right[0]) / 2.0, (left[1] + right[1]) / 2.0)
+    matrix = cv2.getRotationMatrix2D((float(center[0]), float(center[1])), angle, scale)
+    matrix[0, 2] += size * 0.5 - center[0]
+    matrix[1, 2] += size * ALIGN_EYE_Y - center[1]
+    return matrix
+
+
+def face_matrix(box, points=None, size=ALIGN_FACE_SIZE):
+    """Alignment transform for one face; returns ``(matrix, aligned)`` where ``aligned`` says landmarks were used."""
+    box = tuple(int(v) for v in box)
+    if points is not None:
+        left, right = eye_centers(points)
+        if plausible_eyes(left, right, box):
+            return alignment_matrix(left, right, size), True
+    return alignment_matrix(*box_eye_centers(box), size=size), False
+
+
+def align_face(frame, box, landmarks=None, size=ALIGN_FACE_SIZE):
+    """Aligned ``size`` x ``size`` crop of the face in ``box`` (one cv2.warpAffine).
+
+    ``landmarks`` is the frame's landmarks.FrameLandmarks; the crop is cached
+    on it, so asking again for the same face in the same frame is free.
+    Without landmarks (or with implausible ones) the face is framed from the
+    box alone, at the same eye positions.
+    """
+    box = tuple(int(v) for v in box)
+    if box[2] <= 0 or box[3] <= 0:
+        return None
+    key = ("aligned", box, size)
+    if landmarks is not None and key in landmarks.cache:
+        return landmarks.cache[key]
+
+    points = landmarks.points(box) if landmarks is not None else None
+    matrix, _ = face_matrix(box, points, size)
+    crop = cv2.warpAffine(frame, matrix, (size, size), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_REPLICATE)
+    if landmarks is not None:
+        landmarks.cache[key] = crop
+    return crop
+
+
+def align_faces(frame, boxes, predictor=None, landmarks=None, size=ALIGN_FACE_SIZE):
+    """Aligned crops for every box in one frame as an ``(N, size, size, 3)`` batch.
+
+    The grayscale conversion and landmark cache are shared by all faces.
+    """
+    if landmarks is None:
+        landmarks = FrameLandmarks(frame, predictor)
+    if len(boxes) == 0:
+        return np.empty((0, size, size, 3), dtype=frame.dtype)
+    blank = np.zeros((size, size) + frame.shape[2:], dtype=frame.dtype)
+    crops = [align_face(frame, box, landmarks, size) for box in boxes]
+    # rows stay in box order; an empty box gives a blank crop
+    return np.stack([blank if c is None else c for c in crops])
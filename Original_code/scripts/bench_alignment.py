@@ -0,0 +1,184 @@
+"""Accuracy and rescan rate of aligned vs. plain box crops on the repository's face images.
+
+Usage: py bench_alignment.py [--tilts 0 10 20] [--thresholds 0.6 0.8] [--images DIR ...]
+
+Images are named ``<person>-image-<n>.<ext>`` (the enrollment photos in
+dataset/). Every image is also rotated by each ``--tilts`` angle (both ways) to
+stand in for a tilted head at the kiosk. Each probe is matched, leave-one-out,
+against the untilted photos of every person, using the same FaceNet crops as
+the gallery. Reported per crop mode and tilt:
+
+  accuracy     nearest gallery photo belongs to the same person
+  rescan_rate  no face was detected, or the same person's best distance is
+               not below the threshold, so the kiosk would answer "unknown"
+               and ask for another scan
+  genuine      median distance to the same person's nearest photo
+  align_ms     median time to produce one crop (landmarks + warpAffine)
+
+"box" is the original crop (Haar box resized to 160x160); "aligned" is
+alignment.align_face with dlib landmarks (box framing when none are found).
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from alignment import align_face
+from face_detection import detect_faces, largest_face
+from landmarks import FrameLandmarks
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HAAR_PATH = os.path.join(os.path.dirname(BASE_DIR), "resources", "haar_face.xml")
+PREDICTOR_PATH = os.path.join(os.path.dirname(BASE_DIR), "shape_predictor", "shape_predictor_68_face_landmarks.dat")
+DEFAULT_IMAGE_DIRS = [os.path.join(BASE_DIR, "dataset")]
+
+
+def load_labeled_images(dirs):
+    images = []
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, "*"))):
+            stem, ext = os.path.splitext(os.path.basename(path))
+            if ext.lower() not in (".jpg", ".jpeg", ".png") or "-image-" not in stem:
+                continue
+            img = cv2.imread(path)
+            if img is not None:
+                images.append((stem.split("-image-")[0], path, img))
+    return images
+
+
+def rotate(img, degrees):
+    if not degrees:
+        return img
+    h, w = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), degrees, 1.0)
+    return cv2.warpAffine(img, matrix, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+
+def box_crop(img, box):
+    x, y, w, h = box
+    face = img[y:y + h, x:x + w]
+    return cv2.resize(face, (160, 160)) if face.size else None
+
+
+def crops_for(cascade, predictor, img, mode):
+    """``(crop, seconds)`` for the largest face in ``img``, or ``(None, 0)``."""
+    box = largest_face(detect_faces(cascade, img, min_face=60))
+    if box is None:
+        return None, 0.0
+    start = time.perf_counter()
+    if mode == "box":
+        crop = box_crop(img, box)
+    else:
+        crop = align_face(img, box, FrameLandmarks(img, predictor))
+    return crop, time.perf_counter() - start
+
+
+def l2(a, b):
+    return float(np.linalg.norm(np.asarray(a) - np.asarray(b)))
+
+
+def evaluate(labels, gallery, probes, thresholds):
+    """Leave-one-out matching of ``probes`` ({index: embedding or None}) against ``gallery`` embeddings.
+
+    Only images whose person has another gallery photo count; a probe with no
+    detected face counts as a rescan (and a miss) at every threshold.
+    """
+    correct, genuine, total = 0, [], 0
+    rejected = {t: 0 for t in thresholds}
+    for i, emb in sorted(probes.items()):
+        if not any(labels[j] == labels[i] for j in gallery if j != i):
+            continue
+        total += 1
+        if emb is None:
+            for t in thresholds:
+                rejected[t] += 1
+            continue
+        others = [(labels[j], l2(emb, g)) for j, g in gallery.items() if j != i]
+        best_name, _ = min(others, key=lambda item: item[1])
+        correct += best_name == labels[i]
+        nearest_same = min(d for name, d in others if name == labels[i])
+        genuine.append(nearest_same)
+        for t in thresholds:
+            rejected[t] += nearest_same >= t
+    return {
+        "probes": total,
+        "detected": len(genuine),
+        "accuracy": correct / float(total) if total else None,
+        "rescan_rate": {str(t): rejected[t] / float(total) if total else None for t in thresholds},
+        "genuine_median": statistics.median(genuine) if genuine else None,
+    }
+
+
+def _fmt(value):
+    return "n/a" if value is None else f"{value:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tilts", type=float, nargs="+", default=[0, 10, 20])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.8])
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGE_DIRS)
+    args = parser.parse_args()
+
+    images = load_labeled_images(args.images)
+    if not images:
+        print("No labeled images found")
+        return
+    labels = [name for name, _, _ in images]
+    print(f"{len(images)} images of {len(set(labels))} people")
+
+    cascade = cv2.CascadeClassifier(HAAR_PATH)
+    predictor = None
+    try:
+        import dlib
+        predictor = dlib.shape_predictor(PREDICTOR_PATH)
+    except Exception as e:
+        print(f"Landmark predictor unavailable ({e}); 'aligned' uses box framing only")
+
+    from keras_facenet import FaceNet
+    embedder = FaceNet()
+
+    def embed(crops):
+        keys = [k for k, c in crops.items() if c is not None]
+        if not keys:
+            return {}
+        return dict(zip(keys, embedder.embeddings(np.stack([crops[k] for k in keys]))))
+
+    results = []
+    for mode in ("box", "aligned"):
+        crops, timings = {}, []
+        for i, (_, _, img) in enumerate(images):
+            crops[i], seconds = crops_for(cascade, predictor, img, mode)
+            if crops[i] is not None:
+                timings.append(seconds)
+        gallery = embed(crops)
+
+        for tilt in args.tilts:
+            for sign in ((1,) if not tilt else (1, -1)):
+                probe_crops = {}
+                for i, (_, _, img) in enumerate(images):
+                    probe_crops[i], _ = crops_for(cascade, predictor, rotate(img, sign * tilt), mode)
+                embedded = embed(probe_crops)
+                probes = {i: embedded.get(i) for i in probe_crops}
+                row = evaluate(labels, gallery, probes, args.thresholds)
+                row.update({
+                    "mode": mode,
+                    "tilt_deg": sign * tilt,
+                    "align_ms": 1000.0 * statistics.median(timings) if timings else None,
+                })
+                results.append(row)
+                rescans = "  ".join(f"rescan@{t}={_fmt(row['rescan_rate'][str(t)])}" for t in args.thresholds)
+                print(f"mode={mode:<7}  tilt={sign * tilt:+5.0f}  probes={row['probes']:>3}  detected={row['detected']:>3}  "
+                      f"accuracy={_fmt(row['accuracy'])}  {rescans}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Latency vs. recall of downscaled Haar detection on the repository's face images.
+
+Usage: py bench_detection.py [--sides 0 960 640 480 320] [--repeat 3] [--images DIR ...] [--width 1920]
+
+The reference is the original detector: full resolution, scaleFactor=1.1,
+minNeighbors=3, minSize=60. For each max-side setting (0 = full resolution),
+with and without the kiosk face-size bounds, it reports the median detection
+time per image and the recall of the reference's largest face (IoU >= 0.5).
+The stored kiosk captures are only 480-640 px wide; ``--width 1920`` upscales
+them first to approximate the 1080p uploads that downscaling is aimed at.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from face_detection import detect_faces, face_size_bounds
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
+HAAR_PATH = os.path.join(os.path.dirname(BASE_DIR), "resources", "haar_face.xml")
+DEFAULT_IMAGE_DIRS = [
+    os.path.join(BASE_DIR, "dataset"),
+    os.path.join(REPO_ROOT, "embeddings", "uploads", "incoming"),
+]
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / float(union) if union else 0.0
+
+
+def load_images(dirs, width=None):
+    images = []
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, "*"))):
+            if os.path.splitext(path)[1].lower() not in (".jpg", ".jpeg", ".png"):
+                continue
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            if width:
+                height = int(round(img.shape[0] * width / float(img.shape[1])))
+                img = cv2.resize(img, (width, height), interpolation=cv2.INTER_CUBIC)
+            images.append((path, img))
+    return images
+
+
+def reference_faces(cascade, img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(60, 60))
+    if len(faces) == 0:
+        return None
+    return tuple(max(faces, key=lambda b: b[2] * b[3]))
+
+
+def run(cascade, images, refs, max_side, kiosk, repeat):
+    times, hits, total = [], 0, 0
+    for (_, img), ref in zip(images, refs):
+        min_face, max_face = face_size_bounds(img.shape[1]) if kiosk else (60, None)
+        per_image = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = detect_faces(cascade, img, max_side=max_side or None, min_face=min_face, max_face=max_face)
+            per_image.append(time.perf_counter() - start)
+        times.append(min(per_image))
+        if ref is not None:
+            total += 1
+            if any(iou(ref, tuple(b)) >= 0.5 for b in boxes):
+                hits += 1
+    return {
+        "max_side": max_side or "full",
+        "kiosk_bounds": kiosk,
+        "median_ms": 1000.0 * statistics.median(times),
+        "p95_ms": 1000.0 * float(np.percentile(times, 95)),
+        "recall": hits / float(total) if total else None,
+        "reference_faces": total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sides", type=int, nargs="+", default=[0, 960, 640, 480, 320])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGE_DIRS)
+    parser.add_argument("--width", type=int, default=0, help="resize images to this width first")
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(HAAR_PATH)
+    images = load_images(args.images, args.width or None)
+    if not images:
+        print("No images found")
+        return
+    refs = [reference_faces(cascade, img) for _, img in images]
+    print(f"{len(images)} images, {sum(r is not None for r in refs)} with a reference face")
+
+    results = []
+    for kiosk in (False, True):
+        for side in args.sides:
+            row = run(cascade, images, refs, side, kiosk, args.repeat)
+            results.append(row)
+            recall = "n/a" if row["recall"] is None else f"{row['recall']:.3f}"
+            print(f"max_side={str(row['max_side']):>5}  kiosk_bounds={str(kiosk):<5}  "
+                  f"median={row['median_ms']:7.2f}ms  p95={row['p95_ms']:7.2f}ms  recall={recall}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
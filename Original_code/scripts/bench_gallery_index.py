@@ -0,0 +1,58 @@
+"""Measure recall and latency of the ANN gallery backend against exact search.
+
+Usage: py bench_gallery_index.py [--sizes 1000 10000 50000] [--nprobe 8] [--queries 200]
+
+Galleries are synthetic unit-length 512-d vectors; each query is an enrolled
+vector plus noise, mimicking a fresh scan of a registered face.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from gallery_index import ExactIndex, IVFIndex, evaluate_index
+
+
+def synthetic_gallery(size, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def noisy_queries(vectors, count, noise=0.03, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(vectors.shape[0], count, replace=False)
+    queries = vectors[picks] + rng.normal(scale=noise, size=(count, vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=1)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        vectors = synthetic_gallery(size)
+        ids = np.arange(size)
+
+        exact = ExactIndex(dim=vectors.shape[1])
+        exact.add(ids, vectors)
+        ivf = IVFIndex(dim=vectors.shape[1], nprobe=args.nprobe, train_threshold=min(size, 2048))
+        ivf.add(ids, vectors)
+
+        stats = evaluate_index(ivf, exact, noisy_queries(vectors, min(args.queries, size)), k=args.k)
+        stats.update({"size": size, "nprobe": args.nprobe, "k": args.k})
+        results.append(stats)
+        print(f"size={size:>7}  recall@{args.k}={stats['recall']:.3f}  "
+              f"ivf={stats['latency_ms']:.3f}ms  exact={stats['reference_latency_ms']:.3f}ms")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""End-to-end latency of the recognition pipeline, stage by stage and through the Flask routes.
+
+Usage: py bench_pipeline.py [--sizes 100 1000 10000 100000] [--iterations 50] [--image PATH]
+                            [--concurrency 4] [--output FILE] [--compare OLD.json]
+
+Stages (run once, they do not depend on the gallery):
+  decode   server.decode_image_from_data_url on the probe photo
+  detect   server.detect_face (kiosk=False, as for uploads)
+  embed    server.get_embedding (alignment + FaceNet through the batch scheduler)
+Per synthetic gallery size (random unit vectors, plus the probe's own embedding
+so the probe is a known user):
+  match      gallery.best_match
+  recognize  POST /recognize (multipart upload)
+  login      POST /login with an image_url
+  register   POST /register with SAMPLES_REQUIRED data-URL frames
+
+The PHP backend is replaced by a local HTTP stub (empty roster, save_user.php
+always succeeds, and it serves the probe photo for image_url requests), and
+caches/uploads go to a temporary directory; apart from the results file,
+nothing outside it is touched. Each stage reports p50/p95/p99 in ms and
+sequential throughput; ``--concurrency`` also measures /recognize throughput
+with that many client threads. Results are written as JSON
+(bench_results/pipeline-<time>.json next to this script by default, ignored
+by git); ``--compare`` prints the p50/p95 change against an earlier file.
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE = os.path.join(BASE_DIR, "dataset", "Patrick Togonon-image-0.png")
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "bench_results")
+STUB_VERSION = "bench"
+
+
+class _PhpStub(BaseHTTPRequestHandler):
+    """Just enough of the PHP API for server.py: roster, save_user.php and the probe photo."""
+
+    photo = b""
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if content_type == "application/json":
+            self.send_header("ETag", f'"{STUB_VERSION}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.endswith("/get-users") or path.endswith("/get-state"):
+            if self.headers.get("If-None-Match") == f'"{STUB_VERSION}"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(200, json.dumps({"version": STUB_VERSION, "users": []}).encode())
+        elif path.startswith("/photos/"):
+            self._send(200, self.photo, "application/octet-stream")
+        else:
+            self._send(404, b'{"status":"error"}')
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if self.path.split("?")[0].endswith("/save_user.php"):
+            self._send(200, json.dumps({"status": "success", "user_id": 1}).encode())
+        else:
+            self._send(404, b'{"status":"error"}')
+
+    def log_message(self, *args):
+        pass
+
+
+def start_php_stub(photo):
+    _PhpStub.photo = photo
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _PhpStub)
+    threading.Thread(target=httpd.serve_forever, name="php-stub", daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def summarize(name, samples, wall=None, **extra):
+    """p50/p95/p99 (ms) and throughput for a list of per-call durations in seconds."""
+    samples = np.asarray(samples, dtype=np.float64) * 1000.0
+    wall = wall if wall is not None else samples.sum() / 1000.0
+    row = {
+        "stage": name,
+        "n": int(samples.size),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+        "throughput_per_s": float(samples.size / wall) if wall > 0 else None,
+    }
+    row.update(extra)
+    return row
+
+
+def timed(fn, iterations, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - started
+
+
+def timed_concurrent(make_call, iterations, workers):
+    """Run ``iterations`` calls over ``workers`` threads; ``make_call()`` returns a per-thread callable."""
+    local = threading.local()
+    samples = []
+    lock = threading.Lock()
+
+    def _one(_):
+        if not hasattr(local, "call"):
+            local.call = make_call()
+        t0 = time.perf_counter()
+        local.call()
+        elapsed = time.perf_counter() - t0
+        with lock:
+            samples.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_one, range(iterations)))
+    return samples, time.perf_counter() - started
+
+
+def synthetic_users(size, probe_embedding, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(size - 1, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    users = {f"bench-user-{i}": {"id": i, "templates": vectors[i:i + 1]} for i in range(size - 1)}
+    users["bench-probe"] = {"id": size, "templates": np.asarray(probe_embedding, dtype=np.float32).reshape(1, -1)}
+    return users
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, results):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = {(r["stage"], r.get("gallery_size")): r for r in json.load(f).get("results", [])}
+    print(f"\nChange vs {old_path} (positive = slower):")
+    for row in results:
+        prev = old.get((row["stage"], row.get("gallery_size")))
+        if prev is None:
+            continue
+        deltas = "  ".join(f"{k}={100.0 * (row[k] - prev[k]) / prev[k]:+6.1f}%"
+                           for k in ("p50_ms", "p95_ms") if prev.get(k))
+        print(f"  {row['stage']:<10} size={str(row.get('gallery_size') or '-'):>7}  {deltas}")
+
+
+def print_row(row):
+    size = row.get("gallery_size")
+    print(f"{row['stage']:<10} size={str(size or '-'):>7}  p50={row['p50_ms']:8.2f}ms  "
+          f"p95={row['p95_ms']:8.2f}ms  p99={row['p99_ms']:8.2f}ms  "
+          f"throughput={row['throughput_per_s'] or 0:8.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--route-iterations", type=int, default=20,
+                        help="iterations for the Flask routes (register embeds several frames)")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="probe photo containing one face")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="client threads for a concurrent /recognize run (0 = skip)")
+    parser.add_argument("--backend", default=None, help="gallery index backend (default: TECHNEST_GALLERY_INDEX)")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's own log output")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        photo = f.read()
+    data_url = "data:image/png;base64," + base64.b64encode(photo).decode("ascii")
+    httpd, stub_url = start_php_stub(photo)
+    workdir = tempfile.mkdtemp(prefix="technest-bench-")
+
+    # importing server loads no models and makes no requests (see warm_up)
+    import server
+    from embedding_store import EmbeddingStore
+    from gallery import Gallery
+    from user_directory import UserDirectory
+
+    server.PHP_API_URL = f"{stub_url}/api"
+    server.USER_DIRECTORY = UserDirectory(server.PHP_API_URL, poll_interval=0, timeout=5)
+    server.EMBEDDING_STORE = EmbeddingStore(directory=os.path.join(workdir, "cache"),
+                                            model_id=server.EMBEDDING_STORE.model_id)
+    server.FRONTEND_UPLOAD_DIR = os.path.join(workdir, "uploads")
+    server.DATASET_DIR = os.path.join(workdir, "dataset")
+    os.makedirs(server.DATASET_DIR, exist_ok=True)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    server.warm_up(camera=False)
+    warm_up_seconds = time.perf_counter() - started
+    print(f"Models and (stub) gallery ready in {warm_up_seconds:.1f}s; probe {os.path.basename(args.image)}")
+
+    img = server.decode_image_from_data_url(data_url)
+    # uploads are detected without the kiosk face-size bounds, as in the routes
+    box = server.detect_face(img, kiosk=False)
+    if box is None:
+        print("No face found in the probe image")
+        return 1
+    probe_embedding = server.get_embedding(img, box)
+
+    results = []
+    with quiet:
+        samples, wall = timed(lambda: server.decode_image_from_data_url(data_url), args.iterations)
+        results.append(summarize("decode", samples, wall))
+        samples, wall = timed(lambda: server.detect_face(img, kiosk=False), args.iterations)
+        results.append(summarize("detect", samples, wall))
+        samples, wall = timed(lambda: server.get_embedding(img, box), args.iterations)
+        results.append(summarize("embed", samples, wall))
+    for row in results:
+        print_row(row)
+
+    client = server.app.test_client()
+    frames = [data_url] * server.SAMPLES_REQUIRED
+
+    def recognize_call(c=client):
+        response = c.post("/recognize", data={"image": (io.BytesIO(photo), "probe.png")},
+                          content_type="multipart/form-data")
+        return response.status_code
+
+    for size in args.sizes:
+        t0 = time.perf_counter()
+        server.GALLERY = Gallery.from_users(synthetic_users(size, probe_embedding), backend=args.backend)
+        build_seconds = time.perf_counter() - t0
+        gallery = server.GALLERY
+        rows = []
+        with quiet:
+            samples, wall = timed(lambda: gallery.best_match(probe_embedding), args.iterations)
+            rows.append(summarize("match", samples, wall))
+            samples, wall = timed(recognize_call, args.route_iterations)
+            rows.append(summarize("recognize", samples, wall))
+            samples, wall = timed(lambda: client.post("/login", data={"image_url": f"{stub_url}/photos/probe.png"}),
+                                  args.route_iterations)
+            rows.append(summarize("login", samples, wall))
+            samples, wall = timed(lambda: client.post("/register", json={"name": "bench-register", "frames": frames}),
+                                  args.route_iterations)
+            rows.append(summarize("register", samples, wall))
+            if args.concurrency > 0:
+                samples, wall = timed_concurrent(lambda: (lambda c=server.app.test_client(): recognize_call(c)),
+                                                 args.route_iterations * args.concurrency, args.concurrency)
+                rows.append(summarize("recognize_concurrent", samples, wall, concurrency=args.concurrency))
+        for row in rows:
+            row.update({"gallery_size": size, "gallery_build_s": build_seconds})
+            print_row(row)
+        results.extend(rows)
+
+    httpd.shutdown()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "image": os.path.basename(args.image),
+            "iterations": args.iterations,
+            "route_iterations": args.route_iterations,
+            "backend": args.backend or server.GALLERY.backend,
+            "warm_up_s": warm_up_seconds,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
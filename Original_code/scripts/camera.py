@@ -0,0 +1,143 @@
+import threading
+import time
+
+import cv2
+
+from camera_pipeline import LatestFrameGrabber
+
+
+class CameraSession:
+    """One webcam opened and calibrated once, shared by every scan in the process.
+
+    ``open()`` starts a capture thread that always holds the newest frame, and
+    lets autofocus/exposure settle for ``calibration_time`` in the background;
+    ``configure(cap)`` (optional) then applies fixed camera settings on the
+    capture thread. Callers use ``read``/``latest`` like a LatestFrameGrabber and
+    never open or release the device themselves, so after the first scan there
+    is no per-request open or warm-up cost. Frames are shared between callers:
+    copy one before drawing on it.
+    """
+
+    def __init__(self, device=0, calibration_time=2.0, configure=None):
+        self.device = device
+        self.calibration_time = calibration_time
+        self.configure = configure
+        self.error = None
+        self._cap = None
+        self._grabber = None
+        self._opened_at = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self._grabber is not None and not self._grabber.failed
+
+    @property
+    def failed(self):
+        return self._grabber is None or self._grabber.failed
+
+    def open(self):
+        """Open the device if needed; returns False when it cannot be opened."""
+        with self._lock:
+            if self._grabber is not None and not self._grabber.failed:
+                return True
+            self._release()
+
+            cap = cv2.VideoCapture(self.device)
+            if not cap.isOpened():
+                cap.release()
+                self.error = "Unable to open camera"
+                print(f"[CAMERA] {self.error} (device {self.device})")
+                return False
+            try:
+                cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+            except Exception:
+                pass
+
+            self.error = None
+            self._cap = cap
+            self._opened_at = time.monotonic()
+            self._ready.clear()
+            self._grabber = LatestFrameGrabber(cap).start()
+            threading.Thread(target=self._calibrate, args=(self._grabber,),
+                             name="camera-calibration", daemon=True).start()
+            return True
+
+    def _calibrate(self, grabber):
+        _, frame = grabber.read(timeout=self.calibration_time + 5.0)
+        if frame is None:
+            self.error = "Camera returned no frames"
+            print(f"[CAMERA] {self.error}")
+            return
+        # the grabber keeps draining frames while autofocus and exposure settle
+        opened_at = self._opened_at
+        if opened_at is None or grabber is not self._grabber:
+            return  # closed or restarted meanwhile
+        remaining = self.calibration_time - (time.monotonic() - opened_at)
+        if remaining > 0:
+            time.sleep(remaining)
+        if grabber is not self._grabber:
+            return
+
+        done = threading.Event()
+
+        def _apply(cap):
+            if self.configure is not None:
+                self.configure(cap)
+            done.set()
+
+        grabber.call(_apply)
+        if done.wait(timeout=5.0) and grabber is self._grabber:
+            self._ready.set()
+            print(f"[CAMERA] Calibrated in {time.monotonic() - opened_at:.1f}s, ready")
+
+    def wait_ready(self, timeout=None):
+        """Open the camera if needed and wait until calibration is done; returns readiness."""
+        if not self.open():
+            return False
+        self._ready.wait(timeout)
+        return self.ready
+
+    def read(self, after_seq=0, timeout=1.0):
+        """Wait for a frame newer than ``after_seq``; returns ``(seq, frame)`` or ``(after_seq, None)``."""
+        grabber = self._grabber
+        if grabber is None:
+            return after_seq, None
+        return grabber.read(after_seq=after_seq, timeout=timeout)
+
+    def latest(self):
+        grabber = self._grabber
+        return grabber.latest() if grabber is not None else (0, None)
+
+    def status(self):
+        grabber = self._grabber
+        return {
+            "open": grabber is not None and not grabber.failed,
+            "ready": self.ready,
+            "device": self.device,
+            "uptime": round(time.monotonic() - self._opened_at, 1) if self._opened_at else None,
+            "frames": grabber.latest()[0] if grabber is not None else 0,
+            "error": self.error,
+        }
+
+    def restart(self):
+        """Release and reopen the device, recalibrating it."""
+        with self._lock:
+            self._release()
+        print("[CAMERA] Restarting webcam")
+        return self.open()
+
+    def close(self):
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        self._ready.clear()
+        self._opened_at = None
+        if self._grabber is not None:
+            self._grabber.stop()
+            self._grabber = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
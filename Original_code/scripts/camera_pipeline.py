@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+
+from face_tracker import IoUTracker
+
+
+def put_latest(q, item):
+    """Put ``item`` on a bounded queue, discarding the stalest entry if it is full.
+
+    Returns the discarded entry, or None.
+    """
+    dropped = None
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                dropped = q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class LatestFrameGrabber:
+    """Reads a ``cv2.VideoCapture`` on its own thread and keeps only the newest frame.
+
+    The camera is drained at its native rate no matter how slow the consumers
+    are, so nobody ever processes a frame that sat in the driver's buffer.
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._calls = queue.Queue()
+        self.failed = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+            self._thread.start()
+        return self
+
+    def call(self, fn):
+        """Run ``fn(cap)`` on the capture thread before its next read (VideoCapture is not thread-safe)."""
+        self._calls.put(fn)
+
+    def _run(self):
+        while not self._stop.is_set():
+            while not self._calls.empty():
+                fn = self._calls.get_nowait()
+                try:
+                    fn(self.cap)
+                except Exception as e:
+                    print(f"[PIPELINE] Capture callback failed: {e}")
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failed = True
+                with self._cond:
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+    def latest(self):
+        """Return ``(seq, frame)`` for the newest frame without waiting (frame may be None)."""
+        with self._cond:
+            return self._seq, self._frame
+
+    def read(self, after_seq=0, timeout=1.0):
+        """Wait for a frame newer than ``after_seq``; returns ``(seq, frame)`` or ``(after_seq, None)``."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq <= after_seq and not self.failed and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if self._seq <= after_seq:
+                return after_seq, None
+            return self._seq, self._frame
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+
+class RecognitionPipeline:
+    """Detection, tracking and embedding running on their own threads behind a frame grabber.
+
+    capture -> detect+track -> embed, connected by single-slot queues: when a
+    stage falls behind, the older item is dropped instead of queueing up.
+    ``detect_fn(frame)`` returns a box or None and ``embed_fn(frame, box)`` an
+    embedding or None. Every detection is associated with a track (see
+    face_tracker.py) and only tracks that ``tracker.needs_embedding`` are sent to
+    the embedding stage, which attaches the result to the track itself, so no
+    embedding is lost when results are dropped. ``grabber`` may be shared (e.g.
+    a camera.CameraSession); pass ``owns_grabber=False`` to keep it running
+    after ``stop()``.
+    """
+
+    def __init__(self, grabber, detect_fn, embed_fn, tracker=None, owns_grabber=True):
+        self.grabber = grabber
+        self.owns_grabber = owns_grabber
+        self.detect_fn = detect_fn
+        self.embed_fn = embed_fn
+        self.tracker = tracker or IoUTracker()
+        self._to_embed = queue.Queue(maxsize=1)
+        self._results = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.owns_grabber:
+            self.grabber.start()
+        for target, name in ((self._detect_loop, "detect-stage"), (self._embed_loop, "embed-stage")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _detect_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            seq, frame = self.grabber.read(after_seq=seq, timeout=0.5)
+            if frame is None:
+                if self.grabber.failed:
+                    put_latest(self._results, None)
+                    return
+                continue
+            try:
+                box = self.detect_fn(frame)
+            except Exception as e:
+                print(f"[PIPELINE] Detection failed: {e}")
+                continue
+
+            track = None
+            if box is not None:
+                track = self.tracker.update([box])[0]
+                if self.tracker.needs_embedding(track):
+                    track.pending = True
+                    dropped = put_latest(self._to_embed, (frame, box, track))
+                    if dropped is not None:
+                        dropped[2].pending = False
+            else:
+                self.tracker.update([])
+            put_latest(self._results, (seq, frame, box, track))
+
+    def _embed_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame, box, track = self._to_embed.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            emb = None
+            try:
+                emb = self.embed_fn(frame, box)
+            except Exception as e:
+                print(f"[PIPELINE] Embedding failed: {e}")
+            track.set_embedding(emb)
+
+    def next_result(self, timeout=0.05):
+        """Newest ``(seq, frame, box, track)`` if one is ready within ``timeout``.
+
+        ``box`` and ``track`` are None when no face was found. Returns False when
+        nothing is ready yet and None once the camera has stopped.
+        """
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if self.owns_grabber:
+            self.grabber.stop()
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from gallery import Gallery
+
+
+EMBEDDING_SUFFIX = "_embedding.npy"
+LEGACY_SUFFIX = "_embedding.pkl"
+
+
+def embedding_path(dataset_dir, name):
+    return os.path.join(dataset_dir, name, f"{name}{EMBEDDING_SUFFIX}")
+
+
+def save_embedding(dataset_dir, name, embedding):
+    """Write ``<dataset_dir>/<name>/<name>_embedding.npy`` atomically."""
+    user_dir = os.path.join(dataset_dir, name)
+    os.makedirs(user_dir, exist_ok=True)
+    path = embedding_path(dataset_dir, name)
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, np.asarray(embedding, dtype=np.float32).ravel(), allow_pickle=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def legacy_path(dataset_dir, name):
+    return os.path.join(dataset_dir, name, f"{name}{LEGACY_SUFFIX}")
+
+
+class DatasetGallery:
+    """In-memory gallery of the ``DATASET_DIR/<user>/<user>_embedding.npy`` files.
+
+    Loads everything once, then ``refresh()`` only re-reads users whose folder
+    mtime changed (and drops users whose folder disappeared). Checks are
+    throttled to one per ``check_interval`` seconds, so matching a frame
+    normally touches no files at all. Files are read with
+    ``allow_pickle=False``; legacy pickled ``.pkl`` embeddings are never
+    unpickled here and are skipped with a warning until
+    migrate_legacy_embeddings.py has converted them.
+    """
+
+    def __init__(self, dataset_dir, check_interval=1.0):
+        self.dataset_dir = dataset_dir
+        self.check_interval = check_interval
+        self.gallery = Gallery()
+        self._dir_mtimes = {}
+        self._root_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load_user(self, name):
+        path = embedding_path(self.dataset_dir, name)
+        if not os.path.exists(path):
+            if os.path.exists(legacy_path(self.dataset_dir, name)):
+                print(f"[DATASET] Skipping {name}: only a legacy .pkl embedding, "
+                      f"run migrate_legacy_embeddings.py to convert it")
+            self.gallery.remove(name)
+            return
+        try:
+            # one 512-float vector: a plain read is cheaper than setting up a memory map
+            embedding = np.load(path, allow_pickle=False)
+            self.gallery.add(name, np.asarray(embedding, dtype=np.float32).ravel(), {"path": path})
+        except (OSError, ValueError) as e:
+            print(f"[DATASET] Skipping unreadable {path}: {e}")
+
+    def refresh(self, force=False):
+        """Pick up added, changed and removed users; returns True if anything changed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            try:
+                root_mtime = os.stat(self.dataset_dir).st_mtime_ns
+            except FileNotFoundError:
+                root_mtime = None
+
+            if root_mtime != self._root_mtime:
+                names = set()
+                if root_mtime is not None:
+                    names = {entry.name for entry in os.scandir(self.dataset_dir) if entry.is_dir()}
+                self._root_mtime = root_mtime
+            else:
+                names = set(self._dir_mtimes)
+
+            changed = False
+            for name in set(self._dir_mtimes) - names:
+                self._dir_mtimes.pop(name)
+                changed |= self.gallery.remove(name)
+
+            for name in names:
+                try:
+                    mtime = os.stat(os.path.join(self.dataset_dir, name)).st_mtime_ns
+                except FileNotFoundError:
+                    self._dir_mtimes.pop(name, None)
+                    changed |= self.gallery.remove(name)
+                    continue
+                if self._dir_mtimes.get(name) != mtime:
+                    self._load_user(name)
+                    self._dir_mtimes[name] = mtime
+                    changed = True
+            return changed
+
+    def add(self, name, embedding):
+        """Save a user's embedding and publish it immediately."""
+        path = save_embedding(self.dataset_dir, name, embedding)
+        self.gallery.add(name, embedding, {"path": path})
+        with self._lock:
+            try:
+                self._dir_mtimes[name] = os.stat(os.path.dirname(path)).st_mtime_ns
+            except FileNotFoundError:
+                pass
+
+    def users(self):
+        """``[(name, embedding), ...]`` for every enrolled user."""
+        self.refresh()
+        gallery = self.gallery
+        row_ids, vectors = gallery.index.vectors()
+        row_names = gallery.row_names
+        return [(row_names[row], vectors[i]) for i, row in enumerate(row_ids.tolist()) if row in row_names]
+
+    def best_match(self, embedding):
+        self.refresh()
+        return self.gallery.best_match(embedding)
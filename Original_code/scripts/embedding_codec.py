@@ -0,0 +1,144 @@
+import base64
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from embedding_store import MODEL_ID
+from gallery import Gallery
+
+
+# Layout (little-endian), 48-byte header followed by the payload:
+#   magic    4s   b"TNEM"
+#   version  B    FORMAT_VERSION
+#   dtype    B    1 = float32, 2 = float16
+#   dim      H    values per embedding
+#   count    I    number of embeddings (rows)
+#   model    32s  embedder id, utf-8, NUL padded
+#   crc32    I    checksum of everything after the header
+# payload: count * dim values, then a u32 length and that many bytes of utf-8
+# JSON metadata (0 for a bare embedding; {"names": [...], "info": {...}} for a
+# gallery export). The header size keeps the vectors 16-byte aligned, so
+# decoding is a zero-copy np.frombuffer view.
+MAGIC = b"TNEM"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sBBHI32sI")
+HEADER_SIZE = _HEADER.size
+_META_LEN = struct.Struct("<I")
+
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+_DTYPE_CODES = {np.dtype("<f4"): 1, np.dtype("<f2"): 2}
+
+
+class EmbeddingFormatError(ValueError):
+    pass
+
+
+def encode_embeddings(vectors, dtype="float32", model_id=MODEL_ID, meta=None) -> bytes:
+    """Pack a ``(dim,)`` or ``(count, dim)`` array (plus optional JSON ``meta``) into bytes."""
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if dtype not in _DTYPE_CODES:
+        raise EmbeddingFormatError(f"Unsupported dtype: {dtype}")
+    matrix = np.asarray(vectors)
+    matrix = matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+    if matrix.ndim != 2:
+        raise EmbeddingFormatError(f"Expected 1-D or 2-D embeddings, got shape {matrix.shape}")
+    count, dim = matrix.shape
+
+    body = np.ascontiguousarray(matrix, dtype=dtype).tobytes()
+    meta_bytes = json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8") if meta is not None else b""
+    payload = body + _META_LEN.pack(len(meta_bytes)) + meta_bytes
+    model = model_id.encode("utf-8")
+    if len(model) > 32:
+        raise EmbeddingFormatError(f"Model id too long: {model_id}")
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, _DTYPE_CODES[dtype], dim, count, model,
+                          zlib.crc32(payload) & 0xFFFFFFFF)
+    return header + payload
+
+
+def decode_embeddings(data, expected_model=MODEL_ID, verify=True):
+    """Unpack bytes from ``encode_embeddings``; returns ``(matrix, meta, model_id)``.
+
+    ``matrix`` is a read-only ``(count, dim)`` view into ``data`` in the stored
+    dtype (float16 stays float16). Raises EmbeddingFormatError on a bad
+    header, checksum, or an embedding from a different model than
+    ``expected_model`` (pass None to accept any).
+    """
+    data = memoryview(data).cast("B")
+    if len(data) < HEADER_SIZE + _META_LEN.size:
+        raise EmbeddingFormatError("Truncated embedding data")
+    magic, version, code, dim, count, model, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise EmbeddingFormatError("Not a TechNest embedding")
+    if version != FORMAT_VERSION:
+        raise EmbeddingFormatError(f"Unsupported embedding format version {version}")
+    if code not in _DTYPES:
+        raise EmbeddingFormatError(f"Unknown dtype code {code}")
+    model_id = model.rstrip(b"\0").decode("utf-8")
+    if expected_model is not None and model_id != expected_model:
+        raise EmbeddingFormatError(f"Embedding from model {model_id!r}, expected {expected_model!r}")
+
+    payload = data[HEADER_SIZE:]
+    if verify and zlib.crc32(payload) & 0xFFFFFFFF != crc:
+        raise EmbeddingFormatError("Embedding checksum mismatch")
+
+    dtype = _DTYPES[code]
+    body_size = count * dim * dtype.itemsize
+    if len(payload) < body_size + _META_LEN.size:
+        raise EmbeddingFormatError("Truncated embedding data")
+    matrix = np.frombuffer(data, dtype=dtype, count=count * dim, offset=HEADER_SIZE).reshape(count, dim)
+
+    (meta_len,) = _META_LEN.unpack_from(payload, body_size)
+    meta_start = body_size + _META_LEN.size
+    meta = json.loads(bytes(payload[meta_start:meta_start + meta_len])) if meta_len else None
+    return matrix, meta, model_id
+
+
+def encode_embedding(embedding, dtype="float32", model_id=MODEL_ID) -> bytes:
+    return encode_embeddings(np.asarray(embedding).ravel(), dtype=dtype, model_id=model_id)
+
+
+def decode_embedding(data, expected_model=MODEL_ID):
+    """Single embedding as a float32 ``(dim,)`` array (a view when stored as float32)."""
+    matrix, _, _ = decode_embeddings(data, expected_model=expected_model)
+    if matrix.shape[0] != 1:
+        raise EmbeddingFormatError(f"Expected one embedding, got {matrix.shape[0]}")
+    return matrix[0].astype(np.float32, copy=False)
+
+
+def to_text(data: bytes) -> str:
+    """Base64 form for form fields and JSON (4/3 of the binary size; hex pickle was over 2x)."""
+    return base64.b64encode(data).decode("ascii")
+
+
+def from_text(text) -> bytes:
+    return base64.b64decode(text, validate=True)
+
+
+def export_gallery(gallery, dtype="float32", model_id=MODEL_ID) -> bytes:
+    """Every enrolled template of a gallery.Gallery, with names and info, as one blob."""
+    row_ids, vectors = gallery.index.vectors()
+    row_names, info = gallery.row_names, gallery.info
+    rows = row_ids.tolist()
+    keep = [i for i, row in enumerate(rows) if row in row_names]
+    names = [row_names[rows[i]] for i in keep]
+    meta = {"names": names, "info": {name: info.get(name, {}) for name in names}}
+    matrix = vectors[keep] if keep else np.empty((0, gallery.dim), dtype=np.float32)
+    return encode_embeddings(matrix, dtype=dtype, model_id=model_id, meta=meta)
+
+
+def import_gallery(data, backend=None, expected_model=MODEL_ID, **index_options):
+    """Inverse of ``export_gallery``; returns a new gallery.Gallery."""
+    matrix, meta, _ = decode_embeddings(data, expected_model=expected_model)
+    meta = meta or {}
+    names = meta.get("names", [])
+    if len(names) != matrix.shape[0]:
+        raise EmbeddingFormatError("Gallery names do not match the embedding count")
+    info = meta.get("info", {})
+    # a user with several templates appears once per row
+    rows = {}
+    for i, name in enumerate(names):
+        rows.setdefault(name, []).append(i)
+    users = {name: {**info.get(name, {}), "templates": matrix[idx]} for name, idx in rows.items()}
+    return Gallery.from_users(users, backend=backend, **index_options)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+
+
+STORE_VERSION = 2
+# version 1 stores (one row per user) still load: a missing "count" means one row
+READABLE_VERSIONS = (1, STORE_VERSION)
+# keras-facenet's default weights; bump this when the embedder changes so stale vectors are dropped
+MODEL_ID = "facenet-20180402-114759"
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+META_FILENAME = "embeddings.json"
+# server.py and the recognize_cli worker share the cache directory: a store only
+# deletes matrices it wrote itself, plus unreferenced ones older than this
+# (left behind by earlier runs), so it never removes a file another process uses
+STALE_MATRIX_SECONDS = 24 * 3600
+
+
+def photo_fingerprint(photo_urls) -> str:
+    """Hash of a user's photo list. Uploads get unique filenames, so any new photo changes it."""
+    normalized = json.dumps([u for u in (photo_urls or []) if u], separators=(",", ":"))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_content_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def user_key(user: dict) -> str:
+    """Stable cache key for a PHP user record: its id, falling back to the name."""
+    uid = user.get("id") or user.get("user_id")
+    return f"id:{uid}" if uid else f"name:{user.get('name')}"
+
+
+class EmbeddingStore:
+    """Versioned on-disk cache of user embeddings.
+
+    Embeddings live in a ``.npy`` matrix and ``embeddings.json`` describes each
+    user's block of rows: user key, name, metadata, photo-list fingerprint, the
+    number of template rows and the content hash of the photo behind each
+    template (None for live camera samples). The sidecar names the matrix
+    file it belongs to, and a save writes a fresh matrix before atomically
+    replacing the sidecar, so a reader never pairs rows with the wrong metadata.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, model_id=MODEL_ID):
+        self.directory = directory
+        self.model_id = model_id
+        self.meta_path = os.path.join(directory, META_FILENAME)
+        # key -> {"name", "fingerprint", "photo_hashes", "info", "templates" (T, dim)}
+        self.entries = {}
+        self.dirty = False
+        # matrix files this instance wrote, candidates for cleanup once unreferenced
+        self._written = set()
+
+    def load(self) -> bool:
+        """Load the cache from disk. Returns False (and starts empty) if missing or stale."""
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") not in READABLE_VERSIONS or meta.get("model") != self.model_id:
+                print("[CACHE] Embedding cache is from another version/model, ignoring it")
+                return False
+            rows = meta.get("rows", [])
+            matrix = np.load(os.path.join(self.directory, meta["matrix"]), mmap_mode="r")
+            if matrix.shape[0] != sum(row.get("count", 1) for row in rows):
+                print("[CACHE] Embedding cache is inconsistent, ignoring it")
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"[CACHE ERROR] Could not read embedding cache: {e}")
+            return False
+
+        start = 0
+        for row in rows:
+            count = row.get("count", 1)
+            hashes = row["photo_hashes"] if "photo_hashes" in row else [row.get("photo_hash")]
+            self.entries[row["key"]] = {
+                "name": row["name"],
+                "fingerprint": row.get("fingerprint"),
+                "photo_hashes": list(hashes),
+                "info": row.get("info", {}),
+                "templates": np.array(matrix[start:start + count], dtype=np.float32),
+            }
+            start += count
+        return True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, fingerprint=None):
+        """Return the cached entry for ``key`` if its photo fingerprint still matches."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if fingerprint is not None and entry.get("fingerprint") != fingerprint:
+            return None
+        return entry
+
+    def find_by_photo_hash(self, photo_hash):
+        """Return a cached embedding computed from identical image bytes, if any."""
+        if not photo_hash:
+            return None
+        for entry in self.entries.values():
+            for i, known in enumerate(entry["photo_hashes"]):
+                if known == photo_hash:
+                    return entry["templates"][i]
+        return None
+
+    def put(self, key, name, templates, info=None, fingerprint=None, photo_hashes=None):
+        """Store one embedding or ``(T, dim)`` templates, with the photo hash behind each row."""
+        templates = np.asarray(templates, dtype=np.float32)
+        templates = templates.reshape(-1, templates.shape[-1])
+        if photo_hashes is None or isinstance(photo_hashes, str):
+            photo_hashes = [photo_hashes] * templates.shape[0]
+        self.entries[key] = {
+            "name": name,
+            "fingerprint": fingerprint,
+            "photo_hashes": list(photo_hashes),
+            "info": {k: v for k, v in (info or {}).items() if k not in ("embedding", "templates")},
+            "templates": templates,
+        }
+        self.dirty = True
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def prune(self, keep_keys):
+        """Drop every entry whose key is not in ``keep_keys``; returns the removed names."""
+        removed = [k for k in self.entries if k not in keep_keys]
+        names = [self.entries[k]["name"] for k in removed]
+        for key in removed:
+            del self.entries[key]
+        if removed:
+            self.dirty = True
+        return names
+
+    def users_data(self) -> dict:
+        """Entries in the ``{name: {"id", "role", "dept", "embedding", "templates", ...}}`` shape of USERS_DATA."""
+        users = {}
+        for entry in self.entries.values():
+            templates = entry["templates"]
+            users[entry["name"]] = {**entry["info"], "embedding": templates[0], "templates": templates}
+        return users
+
+    def save(self, force=False) -> bool:
+        if not self.dirty and not force:
+            return True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            keys = list(self.entries)
+            if keys:
+                matrix = np.vstack([self.entries[k]["templates"] for k in keys]).astype(np.float32)
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+
+            matrix_name = f"embeddings-{uuid.uuid4().hex[:12]}.npy"
+            np.save(os.path.join(self.directory, matrix_name), matrix)
+            self._written.add(matrix_name)
+
+            meta = {
+                "version": STORE_VERSION,
+                "model": self.model_id,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "matrix": matrix_name,
+                "rows": [
+                    {
+                        "key": k,
+                        "name": self.entries[k]["name"],
+                        "fingerprint": self.entries[k]["fingerprint"],
+                        "count": int(self.entries[k]["templates"].shape[0]),
+                        "photo_hashes": self.entries[k]["photo_hashes"],
+                        "info": self.entries[k]["info"],
+                    }
+                    for k in keys
+                ],
+            }
+            # unique per writer, so two processes saving at once never share a temp file
+            tmp_path = f"{self.meta_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self.meta_path)
+            self.dirty = False
+        except Exception as e:
+            print(f"[CACHE ERROR] Could not write embedding cache: {e}")
+            return False
+
+        self._remove_stale_matrices(matrix_name)
+        return True
+
+    def _referenced_matrix(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("matrix")
+        except (OSError, ValueError):
+            return None
+
+    def _remove_stale_matrices(self, current):
+        """Delete matrices the sidecar no longer names: our own older ones, and long-abandoned ones."""
+        referenced = self._referenced_matrix()
+        now = time.time()
+        for fname in os.listdir(self.directory):
+            if not (fname.startswith("embeddings-") and fname.endswith(".npy")) or fname in (current, referenced):
+                continue
+            path = os.path.join(self.directory, fname)
+            if fname not in self._written:
+                try:
+                    if now - os.path.getmtime(path) < STALE_MATRIX_SECONDS:
+                        continue  # possibly another process's latest save
+                except OSError:
+                    continue
+            try:
+                os.remove(path)
+                self._written.discard(fname)
+            except OSError:
+                # still mapped by another process (Windows); it is cleaned up on a later save
+                pass
@@ -0,0 +1,76 @@
+import math
+
+import cv2
+import numpy as np
+
+
+# Haar runs on a copy whose longest side is at most this many pixels; boxes are
+# scaled back to the original frame, so crops keep full resolution.
+DETECT_MAX_SIDE = 640
+
+# Expected distance between the kiosk camera and the person being scanned.
+# Together with the camera's field of view this bounds how big a face can be
+# relative to the frame width, which lets the cascade skip every other scale.
+# attendance.js only sends a scan when the face is 27-43% of the frame width
+# (roughly 30-50 cm away); the range below leaves margin on both sides.
+KIOSK_MIN_DISTANCE_CM = 20
+KIOSK_MAX_DISTANCE_CM = 80
+CAMERA_HFOV_DEG = 60.0
+FACE_WIDTH_CM = 15.0
+
+# The cascade window is 24x24; anything smaller cannot be detected anyway.
+CASCADE_MIN_WINDOW = 24
+
+
+def face_size_bounds(frame_width, min_distance_cm=KIOSK_MIN_DISTANCE_CM, max_distance_cm=KIOSK_MAX_DISTANCE_CM,
+                     hfov_deg=CAMERA_HFOV_DEG, face_width_cm=FACE_WIDTH_CM):
+    """Pinhole estimate of the (min, max) face width in pixels for a frame of ``frame_width``."""
+    focal_px = (frame_width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+    min_px = focal_px * face_width_cm / float(max_distance_cm) if max_distance_cm else 0
+    max_px = focal_px * face_width_cm / float(min_distance_cm) if min_distance_cm else None
+    return int(min_px), (int(max_px) if max_px else None)
+
+
+def detect_faces(cascade, frame, gray=None, max_side=DETECT_MAX_SIDE, min_face=None, max_face=None,
+                 scale_factor=1.1, min_neighbors=3):
+    """Run ``cascade`` on a downscaled copy of ``frame`` and return boxes in original coordinates.
+
+    ``min_face``/``max_face`` are face widths in original-frame pixels (None for
+    no bound). Returns an ``(N, 4)`` int array of ``x, y, w, h`` boxes sorted by
+    area, largest first.
+    """
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height, width = gray.shape[:2]
+
+    scale = 1.0
+    if max_side and max(height, width) > max_side:
+        scale = max_side / float(max(height, width))
+        gray = cv2.resize(gray, (int(round(width * scale)), int(round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    min_px = max(CASCADE_MIN_WINDOW, int((min_face or 0) * scale))
+    kwargs = {"scaleFactor": scale_factor, "minNeighbors": min_neighbors, "minSize": (min_px, min_px)}
+    if max_face:
+        max_px = max(min_px + 1, int(math.ceil(max_face * scale)))
+        kwargs["maxSize"] = (max_px, max_px)
+
+    faces = cascade.detectMultiScale(gray, **kwargs)
+    if len(faces) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+
+    boxes = np.asarray(faces, dtype=np.float32)
+    if scale != 1.0:
+        boxes /= scale
+    boxes = np.round(boxes).astype(np.int32)
+    # clamp to the frame so crops never go out of bounds after rounding
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes[np.argsort(-(boxes[:, 2] * boxes[:, 3]))]
+
+
+def largest_face(boxes):
+    """First (largest) box from ``detect_faces`` as an ``(x, y, w, h)`` tuple, or None."""
+    if len(boxes) == 0:
+        return None
+    return tuple(int(v) for v in boxes[0])
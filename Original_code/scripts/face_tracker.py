@@ -0,0 +1,150 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two lists of ``(x, y, w, h)`` boxes, as an ``(len(a), len(b))`` array."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = iw * ih
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    """One face followed across frames, with the identity votes collected for it.
+
+    A track is embedded when it appears and then only every ``reembed_interval``
+    seconds; in between, every frame it is seen again counts as another vote for
+    the identity it was last matched to. ``matches`` counts only the votes that
+    came from an embedding, so callers can insist on several independent
+    matches. A re-embedding that disagrees starts the vote over.
+    """
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = self.last_seen = now
+        self.hits = 1
+        self.missed = 0
+        self.embedded_at = None
+        self.embeddings = 0
+        self.pending = False
+        self.identity = None
+        self.votes = 0
+        self.matches = 0
+        self.best_dist = float("inf")
+        self._new_embedding = None
+        self._lock = threading.Lock()
+
+    def set_embedding(self, embedding, now=None):
+        """Attach a fresh embedding; it is handed out once by ``take_embedding``."""
+        with self._lock:
+            self.pending = False
+            if embedding is None:
+                return
+            self._new_embedding = embedding
+            self.embedded_at = time.monotonic() if now is None else now
+            self.embeddings += 1
+
+    def take_embedding(self):
+        with self._lock:
+            embedding, self._new_embedding = self._new_embedding, None
+            return embedding
+
+    def record(self, identity, dist):
+        """Fold a recognition result for this track into its vote."""
+        with self._lock:
+            if identity != self.identity:
+                self.identity = identity
+                self.votes = 0
+                self.matches = 0
+                self.best_dist = float("inf")
+            self.votes += 1
+            self.matches += 1
+            self.best_dist = min(self.best_dist, dist)
+
+    def confirm(self):
+        """Count another frame of an already identified track as a vote."""
+        with self._lock:
+            if self.identity is not None:
+                self.votes += 1
+
+
+class IoUTracker:
+    """Associates per-frame face boxes with tracks by greedy IoU matching.
+
+    Cheap enough to run on every frame; only ``needs_embedding`` tracks have to
+    go through FaceNet. Until a track has ``min_matches`` agreeing embedding
+    matches it is embedded on every frame, so an identity is never confirmed on
+    a single embedding. A track survives ``max_missed`` frames without a
+    matching box before it is dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, reembed_interval=1.0, min_matches=1):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reembed_interval = reembed_interval
+        self.min_matches = min_matches
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, now=None):
+        """Match this frame's ``boxes`` to tracks; returns the track for each box, in order."""
+        now = time.monotonic() if now is None else now
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        assigned = [None] * len(boxes)
+        matched = set()
+
+        if boxes and self.tracks:
+            ious = iou_matrix([t.box for t in self.tracks], boxes)
+            # best pairs first; each track and box is used at most once
+            for flat in np.argsort(-ious, axis=None):
+                ti, bi = np.unravel_index(flat, ious.shape)
+                if ious[ti, bi] < self.iou_threshold:
+                    break
+                if ti in matched or assigned[bi] is not None:
+                    continue
+                track = self.tracks[ti]
+                track.box, track.last_seen = boxes[bi], now
+                track.hits += 1
+                track.missed = 0
+                matched.add(ti)
+                assigned[bi] = track
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                assigned[bi] = Track(next(self._ids), box, now)
+                survivors.append(assigned[bi])
+
+        self.tracks = survivors
+        return assigned
+
+    def needs_embedding(self, track, now=None):
+        """True when ``track`` is short of ``min_matches`` or its last embedding is older than the interval."""
+        if track.pending:
+            return False
+        if track.embedded_at is None or track.matches < self.min_matches:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - track.embedded_at >= self.reembed_interval
+
+    def reset(self):
+        self.tracks = []
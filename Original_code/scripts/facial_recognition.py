@@ -1,14 +1,15 @@
 import cv2
 import dlib
 import numpy as np
-import pickle
-import sys
 import os
 import time
 import requests
 from keras_facenet import FaceNet
-from deepface import DeepFace
 from flask import Flask, request, jsonify
+from camera import CameraSession
+from dataset_gallery import DatasetGallery
+from landmarks import FrameLandmarks
+from liveness import LivenessChecker
 
 app = Flask(__name__)
 
@@ -25,12 +26,15 @@ DATASET_DIR = r"C:\TechNest_Rec_Dataset"
 if not os.path.exists(DATASET_DIR):
     os.makedirs(DATASET_DIR)
 
+# In-memory copy of the per-user <name>_embedding.npy files, refreshed by folder mtime
+DATASET = DatasetGallery(DATASET_DIR)
+
 def bring_window_to_front(winname):
     """Force OpenCV window to the front/topmost."""
     cv2.namedWindow(winname, cv2.WINDOW_NORMAL)
     cv2.setWindowProperty(winname, cv2.WND_PROP_TOPMOST, 1)
 
-def configure_camera(cap, calibration_time=2.5):
+def configure_camera(cap):
     """
     Configure webcam with autofocus (auto-lock) and auto-adjusted lighting.
     - Autofocus enabled for a few seconds, then locked to prevent focus hunting, 
@@ -38,18 +42,10 @@ def configure_camera(cap, calibration_time=2.5):
     - Exposure, brightness, contrast, saturation tuned for balanced lighting, 
     but manual configuration of values for adapting background lightning
     conditions at custom.
-    """
-
-    # Try enabling autofocus (works on many USB cams)
-    cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
 
-    # Allow autofocus to stabilize
-    start = time.time()
-    while time.time() - start < calibration_time:
-        ret, _ = cap.read()
-        if not ret:
-            break
-        cv2.waitKey(1)
+    CAMERA runs this once, after CAMERA_CALIBRATION_TIME seconds of autofocus
+    settling, instead of every scan opening and calibrating its own capture.
+    """
 
     # Lock focus after calibration but slight adjustments for proper focus at user's facial detection
     cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
@@ -66,6 +62,11 @@ def configure_camera(cap, calibration_time=2.5):
     #Can be possibly manipulate values at custom bg lightning.
 
 
+# Opened and calibrated once, shared by register/login/test
+CAMERA_CALIBRATION_TIME = 2.5
+CAMERA = CameraSession(0, calibration_time=CAMERA_CALIBRATION_TIME, configure=configure_camera)
+
+
 def detect_face(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     faces = haar_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=6, minSize=(170, 170))
@@ -95,127 +96,84 @@ def get_embedding(frame, box):
     face_crop = cv2.resize(face_crop, (160, 160))
     return embedder.embeddings([face_crop])[0]
 
+def _detect_face_gray(frame, gray):
+    faces = haar_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=6, minSize=(120, 120))
+    return max(faces, key=lambda b: b[2] * b[3]) if len(faces) > 0 else None
+
+def _face_ear(frame, gray, box):
+    # the gray image from detection is reused for the predictor
+    return FrameLandmarks(frame, predictor, gray=gray).ear(box)
+
 def is_real_face(frame, box, user_dir=None, name=None, sample_type="register", liveness_time=2.0):
     """
-    Liveness + Anti-Spoofing check using DeepFace with a 2.5s dynamic scan window.
-    Works for Register, Reenroll, Login, and Logout.
+    Liveness + Anti-Spoofing check over fresh webcam frames (see liveness.py).
+    A blink seen through the eye landmarks passes straight away; DeepFace's
+    anti-spoofing model only runs on a few face crops when no blink was seen
+    within ``liveness_time`` seconds. Works for Register, Reenroll, Login, and Logout.
+    Returns a LivenessResult (truthy when live); it never ends the process.
     """
-    x, y, w, h = box
-    face_crop = frame[y:y+h, x:x+w]
-    if face_crop.size == 0:
-        return False
+    window = sample_type.capitalize()
 
-    start_time = time.time()
-    dynamic_detected = False
-
-    try:
-        while time.time() - start_time < liveness_time:
-            result = DeepFace.extract_faces(
-                img_path=face_crop,
-                detector_backend="opencv",
-                enforce_detection=False,
-                anti_spoofing=True
-            )
-
-            if result and result[0].get("is_real", False):
-                dynamic_detected = True
-                # draw a green status message while liveness is being verified
-                cv2.putText(frame, "Liveness Verified (Blink/Movement)", (30, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.imshow(sample_type.capitalize(), frame)
-                cv2.waitKey(1)
-
-            # refresh the face_crop each loop
-            new_faces = haar_cascade.detectMultiScale(
-                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
-                scaleFactor=1.3, minNeighbors=6, minSize=(120, 120)
-            )
-            if len(new_faces) == 1:
-                x2, y2, w2, h2 = new_faces[0]
-                face_crop = frame[y2:y2+h2, x2:x2+w2]
-
-        if dynamic_detected:
-            return True
-        else:
-            # Spoof detected
-            popup = np.zeros((200, 600, 3), dtype=np.uint8)
-            cv2.putText(popup, "Spoof Image detected!", (30, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
-            cv2.imshow("Spoof Alert", popup)
-            cv2.waitKey(3000)
-            cv2.destroyWindow("Spoof Alert")
-            print(f"[!] Spoof attempt detected during {sample_type}. Session terminated.")
-            sys.exit(0)
-
-    except Exception as e:
-        print(f"[!] Spoof check failed: {e}")
-        return False
+    def _preview(current, face_box, ear):
+        if face_box is None:
+            return
+        display = current.copy()
+        fx, fy, fw, fh = face_box
+        cv2.rectangle(display, (fx, fy), (fx + fw, fy + fh), (255, 255, 255), 2)
+        cv2.putText(display, "Verifying liveness - please blink", (30, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.imshow(window, display)
+        cv2.waitKey(1)
 
-def save_user(name, embedding):
-    user_dir = os.path.join(DATASET_DIR, name)
-    os.makedirs(user_dir, exist_ok=True)
-    pkl_path = os.path.join(user_dir, f"{name}_embedding.pkl")
+    checker = LivenessChecker(CAMERA, _detect_face_gray, _face_ear, timeout=liveness_time)
+    result = checker.check(on_frame=_preview)
+
+    if not result and result.method == "anti_spoof":
+        # Spoof detected
+        popup = np.zeros((200, 600, 3), dtype=np.uint8)
+        cv2.putText(popup, "Spoof Image detected!", (30, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
+        cv2.imshow("Spoof Alert", popup)
+        cv2.waitKey(3000)
+        cv2.destroyWindow("Spoof Alert")
+        print(f"[!] Spoof attempt detected during {sample_type}.")
+    elif not result:
+        print(f"[!] Liveness check inconclusive during {sample_type}: {result.reason}")
+    return result
 
-    with open(pkl_path, "wb") as f:
-        pickle.dump(embedding, f)
+def save_user(name, embedding):
+    DATASET.add(name, embedding)
     return True
+
 def fetch_users():
-    users = []
-    for user in os.listdir(DATASET_DIR):
-        user_dir = os.path.join(DATASET_DIR, user)
-        if os.path.isdir(user_dir):
-            for f in os.listdir(user_dir):
-                if f.endswith("_embedding.pkl"):
-                    with open(os.path.join(user_dir, f), "rb") as file:
-                        emb = pickle.load(file)
-                        users.append((user, emb))
-    return users
+    return DATASET.users()
 
 def recognize_face(embedding, threshold=0.8):
-    users = fetch_users()
-    min_dist, identity = float("inf"), "Unknown"
-    for name, db_emb in users:
-        dist = np.linalg.norm(embedding - db_emb)
-        if dist < min_dist:
-            min_dist, identity = dist, name
+    # cached gallery; only users whose folder changed are re-read from disk
+    identity, min_dist = DATASET.best_match(embedding)
+    if identity is None:
+        identity = "Unknown"
     return (identity, min_dist) if min_dist < threshold else ("Unknown", min_dist)
 
-def restart_camera(cap):
-    """Release and reopen the webcam, reconfigure it, return new capture object."""
-    cap.release()
-    cap = cv2.VideoCapture(0)
-    configure_camera(cap)
-    print("[Camera] Webcam restarted successfully.")
-    return cap
-
-def eye_aspect_ratio(eye):
-    # compute EAR using 6 eye landmarks
-    A = np.linalg.norm(eye[1] - eye[5])
-    B = np.linalg.norm(eye[2] - eye[4])
-    C = np.linalg.norm(eye[0] - eye[3])
-    return (A + B) / (2.0 * C)
-
-def detect_blink(shape):
-    # landmarks for left and right eyes
-    left_eye = np.array([(shape.part(i).x, shape.part(i).y) for i in range(36, 42)])
-    right_eye = np.array([(shape.part(i).x, shape.part(i).y) for i in range(42, 48)])
-
-    left_ear = eye_aspect_ratio(left_eye)
-    right_ear = eye_aspect_ratio(right_eye)
-
-    return (left_ear + right_ear) / 2.0
+def restart_camera():
+    """Release and reopen the webcam and wait for it to recalibrate."""
+    CAMERA.restart()
+    if CAMERA.wait_ready(timeout=10):
+        print("[Camera] Webcam restarted successfully.")
+    return CAMERA
 
 def test_webcam():
-    cap = cv2.VideoCapture(0)
-    configure_camera(cap)
+    CAMERA.wait_ready(timeout=10)
 
     print("[Webcam Test] Press ESC to exit test mode.")
     start_time = time.time()
+    seq = 0
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        seq, frame = CAMERA.read(after_seq=seq)
+        if frame is None:
             break
+        frame = frame.copy()
 
         box = detect_face(frame)
         if box is not None:
@@ -231,14 +189,14 @@ def test_webcam():
         if key == 27: 
             break
         elif key in [ord("r"), ord("R")]:
-            ca = restart_camera(cap)
+            restart_camera()
+            seq = 0
         elif key in [ord("t"), ord("T")]:
             print("[!] Force close session.")
-            cap.release()
+            CAMERA.close()
             cv2.destroyAllWindows()
             return
 
-    cap.release()
     cv2.destroyAllWindows()
 
 @app.route("/register", methods=["POST"])
@@ -247,13 +205,14 @@ def register_user():
     if not name:
         return jsonify({"status": "error", "message": "Missing name"}), 400
 
-    cap = cv2.VideoCapture(0)
+    CAMERA.wait_ready(timeout=10)
     samples = []
     count = 0
+    seq = 0
 
     while count < 7:
-        ret, frame = cap.read()
-        if not ret:
+        seq, frame = CAMERA.read(after_seq=seq)
+        if frame is None:
             break
         box = detect_face(frame)
         if box is not None:
@@ -263,7 +222,6 @@ def register_user():
                 count += 1
                 time.sleep(1)
 
-    cap.release()
     cv2.destroyAllWindows()
 
     if len(samples) >= 7:
@@ -293,13 +251,14 @@ def login_user():
     if not username:
         return jsonify({"status": "error", "message": "Missing name"}), 400
 
-    cap = cv2.VideoCapture(0)
+    CAMERA.wait_ready(timeout=10)
     verified = False
     count = 0
+    seq = 0
 
     while count < 7:
-        ret, frame = cap.read()
-        if not ret:
+        seq, frame = CAMERA.read(after_seq=seq)
+        if frame is None:
             break
         box = detect_face(frame)
         if box is not None:
@@ -310,7 +269,6 @@ def login_user():
                     count += 1
                     time.sleep(1)
 
-    cap.release()
     cv2.destroyAllWindows()
 
     if count >= 7:
@@ -0,0 +1,219 @@
+import itertools
+import os
+import threading
+
+import numpy as np
+
+from gallery_index import make_index
+
+
+# "exact" scans every enrolled face; "ivf" is approximate and scales to campus-wide rosters
+DEFAULT_INDEX_BACKEND = os.environ.get("TECHNEST_GALLERY_INDEX", "exact")
+
+# Templates kept per user; a user's distance to a probe is the min over them
+MAX_TEMPLATES_PER_USER = int(os.environ.get("TECHNEST_TEMPLATES_PER_USER", "5"))
+
+
+def select_templates(embeddings, max_templates=MAX_TEMPLATES_PER_USER):
+    """Pick up to ``max_templates`` diverse, L2-normalized templates from a user's samples.
+
+    Farthest-point selection: start with the sample closest to the mean, then
+    repeatedly add the sample farthest from everything chosen so far, so the
+    templates cover the user's variation (glasses, lighting, pose) instead of
+    several near-duplicates. Returns ``(templates, indices)`` with the indices
+    into ``embeddings`` of the chosen samples, most representative first.
+    """
+    samples = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    if samples.shape[0] == 0:
+        return samples, []
+    samples = samples / np.maximum(np.linalg.norm(samples, axis=1, keepdims=True), 1e-12)
+
+    mean = samples.mean(axis=0)
+    chosen = [int(np.argmin(np.einsum("ij,ij->i", samples - mean, samples - mean)))]
+    # squared distance from every sample to its nearest chosen template
+    nearest = np.einsum("ij,ij->i", samples - samples[chosen[0]], samples - samples[chosen[0]])
+    while len(chosen) < min(max_templates, samples.shape[0]):
+        nxt = int(np.argmax(nearest))
+        if nearest[nxt] <= 1e-12:
+            break  # the rest are duplicates of chosen templates
+        chosen.append(nxt)
+        diff = samples - samples[nxt]
+        nearest = np.minimum(nearest, np.einsum("ij,ij->i", diff, diff))
+    return samples[chosen], chosen
+
+
+def user_templates(user):
+    """``(T, dim)`` templates of a USERS_DATA-style entry, falling back to its single embedding."""
+    templates = user.get("templates")
+    if templates is None:
+        templates = user.get("embedding")
+    if templates is None:
+        return None
+    templates = np.asarray(templates, dtype=np.float32)
+    return templates.reshape(-1, templates.shape[-1])
+
+
+class Gallery:
+    """Enrolled face embeddings behind a pluggable nearest-neighbour index.
+
+    Every enrolled template gets an integer row id in ``index`` (see
+    gallery_index.py for the exact and IVF backends); a user may own several
+    rows. ``row_names`` maps a row back to its user, ``name_rows`` a user to
+    their rows, and ``info[name]`` keeps the user's metadata (id, role, dept,
+    image_path, ...). Matching a probe is one batched distance computation over
+    all templates; a user's distance is the min over their templates.
+    """
+
+    def __init__(self, dim=512, backend=None, **index_options):
+        self.dim = dim
+        self.backend = backend or DEFAULT_INDEX_BACKEND
+        self.index = make_index(self.backend, dim=dim, **index_options)
+        self.row_names = {}
+        self.name_rows = {}
+        self.info = {}
+        # most rows any user has had; bounds how many hits a k-user search must pull
+        self.max_templates = 1
+        self._next_row = itertools.count()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_users(cls, users_data, backend=None, **index_options):
+        """Build a gallery from a ``{name: {"embedding"/"templates": ..., "id": ..., ...}}`` mapping."""
+        names, blocks = [], []
+        for name, user in users_data.items():
+            templates = user_templates(user)
+            if templates is None or templates.shape[0] == 0:
+                continue
+            names.append(name)
+            blocks.append(templates)
+
+        gallery = cls(dim=blocks[0].shape[1] if blocks else 512, backend=backend, **index_options)
+        if blocks:
+            row_names, name_rows = {}, {}
+            for name, templates in zip(names, blocks):
+                rows = tuple(next(gallery._next_row) for _ in range(templates.shape[0]))
+                name_rows[name] = rows
+                row_names.update((row, name) for row in rows)
+            gallery.index.add(list(row_names), np.vstack(blocks))
+            gallery.row_names = row_names
+            gallery.name_rows = name_rows
+            gallery.max_templates = max(block.shape[0] for block in blocks)
+            gallery.info = {name: {k: v for k, v in users_data[name].items() if k not in ("embedding", "templates")}
+                            for name in names}
+        return gallery
+
+    def __len__(self):
+        return len(self.info)
+
+    def __contains__(self, name):
+        return name in self.info
+
+    def add(self, name, embedding, info=None):
+        """Insert or replace one user's embedding, or ``(T, dim)`` templates."""
+        templates = np.asarray(embedding, dtype=np.float32).reshape(-1, self.dim)
+        with self._write_lock:
+            old_rows = self.name_rows.get(name, ())
+            rows = tuple(next(self._next_row) for _ in range(templates.shape[0]))
+            self.index.add(list(rows), templates)
+            if old_rows:
+                self.index.remove(list(old_rows))
+
+            # publish fresh dicts so readers never see one mid-update
+            row_names = {r: n for r, n in self.row_names.items() if n != name}
+            row_names.update((row, name) for row in rows)
+            self.row_names = row_names
+            self.name_rows = {**self.name_rows, name: rows}
+            self.max_templates = max(self.max_templates, len(rows))
+            self.info = {**self.info, name: {k: v for k, v in (info or {}).items()
+                                             if k not in ("embedding", "templates")}}
+
+    def remove(self, name):
+        """Drop a user; returns False if they were not enrolled."""
+        with self._write_lock:
+            rows = self.name_rows.get(name)
+            if rows is None:
+                return False
+            self.index.remove(list(rows))
+            self.row_names = {r: n for r, n in self.row_names.items() if n != name}
+            self.name_rows = {n: r for n, r in self.name_rows.items() if n != name}
+            self.info = {n: i for n, i in self.info.items() if n != name}
+            return True
+
+    def search(self, embedding, k=1):
+        """Return up to ``k`` ``(name, distance)`` pairs for distinct users, closest first.
+
+        A user's distance is the min over their templates: the index returns
+        rows sorted by distance, so the first row seen for a user is their best.
+        """
+        if k <= 0:
+            return []
+        row_ids, dists = self.index.search(embedding, k * self.max_templates)
+        row_names = self.row_names
+        hits, seen = [], set()
+        for row, dist in zip(row_ids.tolist(), dists.tolist()):
+            name = row_names.get(row)
+            if name is not None and name not in seen:
+                seen.add(name)
+                hits.append((name, float(dist)))
+                if len(hits) == k:
+                    break
+        return hits
+
+    def best_match(self, embedding):
+        """Return ``(name, distance)`` of the closest user, or ``(None, inf)`` if empty."""
+        hits = self.search(embedding, k=1)
+        return hits[0] if hits else (None, float("inf"))
+
+    def assign(self, embeddings, threshold, k=5):
+        """Match several faces from one frame so no user is assigned to two of them.
+
+        Each face considers its ``k`` nearest users under ``threshold``; the
+        assignment maximises the number of matched faces, then minimises their
+        total distance. Returns one ``(name, distance)`` per face, where ``name``
+        is None for a face left unassigned and ``distance`` is its nearest
+        neighbour's distance (inf if the gallery is empty).
+        """
+        candidates = [self.search(emb, k=k) for emb in embeddings]
+        results = [(None, hits[0][1] if hits else float("inf")) for hits in candidates]
+        names = sorted({name for hits in candidates for name, dist in hits if dist < threshold})
+        if not names:
+            return results
+
+        column = {name: j for j, name in enumerate(names)}
+        # a disallowed pair costs more than any set of allowed pairs could save
+        unmatched = threshold * (len(candidates) + 1)
+        cost = np.full((len(candidates), len(names)), unmatched, dtype=np.float64)
+        for i, hits in enumerate(candidates):
+            for name, dist in hits:
+                if dist < threshold:
+                    cost[i, column[name]] = dist
+
+        for i, j in _solve_assignment(cost):
+            if cost[i, j] < unmatched:
+                results[i] = (names[j], float(cost[i, j]))
+        return results
+
+    def get_info(self, name):
+        return self.info.get(name, {})
+
+
+def _solve_assignment(cost):
+    """Minimum-cost (row, col) pairs; Hungarian via scipy if available, else greedy."""
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        linear_sum_assignment = None
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    pairs, used_rows, used_cols = [], set(), set()
+    for flat in np.argsort(cost, axis=None):
+        i, j = np.unravel_index(flat, cost.shape)
+        if i in used_rows or j in used_cols:
+            continue
+        pairs.append((int(i), int(j)))
+        used_rows.add(i)
+        used_cols.add(j)
+    return pairs
@@ -0,0 +1,263 @@
+import time
+
+import numpy as np
+
+
+def _squared_distances(vectors, norms_sq, query):
+    d2 = norms_sq - 2.0 * (vectors @ query) + float(query @ query)
+    np.maximum(d2, 0.0, out=d2)
+    return d2
+
+
+def _top_k(ids, d2, k):
+    """Sort the ``k`` smallest squared distances and return ``(ids, distances)``."""
+    if k < d2.shape[0]:
+        top = np.argpartition(d2, k - 1)[:k]
+        top = top[np.argsort(d2[top])]
+    else:
+        top = np.argsort(d2)
+    return ids[top], np.sqrt(d2[top])
+
+
+class ExactIndex:
+    """Brute-force index: every search scores every stored vector.
+
+    The arrays live in one ``(ids, vectors, norms_sq)`` tuple that writers
+    replace wholesale, so a search running on another thread always sees a
+    consistent snapshot without taking a lock.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self._state = (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, dim), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+        )
+
+    def __len__(self):
+        return self._state[0].shape[0]
+
+    def add(self, ids, vectors):
+        """Insert vectors under ``ids``; an id that already exists is replaced."""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        old_ids, old_vectors, old_norms = self._state
+        keep = ~np.isin(old_ids, ids)
+        self._state = (
+            np.concatenate([old_ids[keep], ids]),
+            np.ascontiguousarray(np.vstack([old_vectors[keep], vectors])),
+            np.concatenate([old_norms[keep], np.einsum("ij,ij->i", vectors, vectors)]),
+        )
+
+    def remove(self, ids):
+        old_ids, old_vectors, old_norms = self._state
+        keep = ~np.isin(old_ids, np.asarray(ids, dtype=np.int64))
+        if not keep.all():
+            self._state = (old_ids[keep], old_vectors[keep], old_norms[keep])
+
+    def search(self, query, k=1):
+        """Return ``(ids, distances)`` of the ``k`` nearest vectors, closest first."""
+        ids, vectors, norms_sq = self._state
+        if ids.shape[0] == 0 or k <= 0:
+            return ids[:0], np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32).ravel()
+        return _top_k(ids, _squared_distances(vectors, norms_sq, query), k)
+
+    def vectors(self):
+        ids, vectors, _ = self._state
+        return ids, vectors
+
+
+def _kmeans(data, nlist, iterations=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroid(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=nlist)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # re-seed empty clusters from random points so every list stays usable
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            centroids[empty] = data[rng.choice(data.shape[0], empty.size, replace=False)]
+    return centroids
+
+
+def _nearest_centroid(data, centroids, chunk=8192):
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], chunk):
+        block = data[start:start + chunk]
+        out[start:start + chunk] = np.argmin(c_norms - 2.0 * (block @ centroids.T), axis=1)
+    return out
+
+
+class IVFIndex:
+    """Inverted-file approximate index (pure NumPy).
+
+    Vectors are bucketed by their nearest k-means centroid; a search only scores
+    the ``nprobe`` buckets closest to the query. Until ``train_threshold``
+    vectors are stored the index is a single bucket, i.e. exact. It trains
+    itself once that size is reached and retrains whenever it has grown by
+    ``retrain_factor`` since, so registrations and deletions never need a
+    manual rebuild.
+    """
+
+    def __init__(self, dim=512, nlist=None, nprobe=8, train_threshold=2048, retrain_factor=4.0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.retrain_factor = retrain_factor
+        self._trained_size = 0
+        # (centroids or None, [(ids, vectors, norms_sq) per list], {id: list_no})
+        self._state = (None, [self._empty_list()], {})
+
+    def _empty_list(self):
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, self.dim), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+        )
+
+    def __len__(self):
+        return len(self._state[2])
+
+    def _all_vectors(self, lists):
+        ids = np.concatenate([lst[0] for lst in lists])
+        vectors = np.vstack([lst[1] for lst in lists])
+        return ids, vectors
+
+    def vectors(self):
+        return self._all_vectors(self._state[1])
+
+    def _build(self, ids, vectors):
+        """Train centroids on ``vectors`` and distribute them into fresh lists."""
+        n = ids.shape[0]
+        if n < self.train_threshold:
+            norms = np.einsum("ij,ij->i", vectors, vectors)
+            self._state = (None, [(ids, vectors, norms)], {int(i): 0 for i in ids})
+            self._trained_size = 0
+            return
+
+        nlist = min(n, self.nlist or max(1, int(np.sqrt(n))))
+        sample = vectors
+        if n > nlist * 256:
+            pick = np.random.default_rng(0).choice(n, nlist * 256, replace=False)
+            sample = vectors[pick]
+        centroids = _kmeans(sample, nlist)
+        assign = _nearest_centroid(vectors, centroids)
+
+        lists = []
+        for list_no in range(nlist):
+            member = assign == list_no
+            vecs = np.ascontiguousarray(vectors[member])
+            lists.append((ids[member], vecs, np.einsum("ij,ij->i", vecs, vecs)))
+        self._state = (centroids, lists, {int(i): int(a) for i, a in zip(ids, assign)})
+        self._trained_size = n
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        self.remove(ids)
+        centroids, lists, owner = self._state
+
+        new_size = len(owner) + len(ids)
+        needs_training = centroids is None and new_size >= self.train_threshold
+        grew = centroids is not None and new_size >= self._trained_size * self.retrain_factor
+        if needs_training or grew:
+            old_ids, old_vectors = self._all_vectors(lists)
+            self._build(np.concatenate([old_ids, ids]), np.vstack([old_vectors, vectors]))
+            return
+
+        assign = np.zeros(len(ids), dtype=np.int64) if centroids is None else _nearest_centroid(vectors, centroids)
+        lists = list(lists)
+        owner = dict(owner)
+        for list_no in np.unique(assign):
+            member = assign == list_no
+            l_ids, l_vecs, l_norms = lists[list_no]
+            vecs = vectors[member]
+            lists[list_no] = (
+                np.concatenate([l_ids, ids[member]]),
+                np.ascontiguousarray(np.vstack([l_vecs, vecs])),
+                np.concatenate([l_norms, np.einsum("ij,ij->i", vecs, vecs)]),
+            )
+            for i in ids[member]:
+                owner[int(i)] = int(list_no)
+        self._state = (centroids, lists, owner)
+
+    def remove(self, ids):
+        centroids, lists, owner = self._state
+        targets = [int(i) for i in np.asarray(ids, dtype=np.int64).ravel() if int(i) in owner]
+        if not targets:
+            return
+        lists = list(lists)
+        owner = dict(owner)
+        by_list = {}
+        for i in targets:
+            by_list.setdefault(owner.pop(i), []).append(i)
+        for list_no, drop in by_list.items():
+            l_ids, l_vecs, l_norms = lists[list_no]
+            keep = ~np.isin(l_ids, drop)
+            lists[list_no] = (l_ids[keep], l_vecs[keep], l_norms[keep])
+        self._state = (centroids, lists, owner)
+
+    def search(self, query, k=1):
+        centroids, lists, _ = self._state
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if centroids is None:
+            probe = lists
+        else:
+            c_d2 = np.einsum("ij,ij->i", centroids, centroids) - 2.0 * (centroids @ query)
+            nprobe = min(self.nprobe, len(lists))
+            probe = [lists[i] for i in np.argpartition(c_d2, nprobe - 1)[:nprobe]]
+        probe = [lst for lst in probe if lst[0].shape[0]]
+        if not probe or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids = np.concatenate([lst[0] for lst in probe])
+        d2 = np.concatenate([_squared_distances(lst[1], lst[2], query) for lst in probe])
+        return _top_k(ids, d2, k)
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def make_index(backend="exact", dim=512, **options):
+    try:
+        return INDEX_BACKENDS[backend](dim=dim, **options)
+    except KeyError:
+        raise ValueError(f"Unknown gallery index backend: {backend}") from None
+
+
+def evaluate_index(index, reference, queries, k=1):
+    """Compare ``index`` against an exact ``reference`` on the same data.
+
+    Returns recall@k (fraction of the reference's top-k the index also found)
+    and mean per-query latency in milliseconds for both.
+    """
+    hits = 0
+    index_time = reference_time = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        got, _ = index.search(query, k)
+        index_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        want, _ = reference.search(query, k)
+        reference_time += time.perf_counter() - start
+
+        hits += len(set(got.tolist()) & set(want.tolist()))
+
+    n = max(1, len(queries))
+    return {
+        "recall": hits / float(n * k),
+        "latency_ms": 1000.0 * index_time / n,
+        "reference_latency_ms": 1000.0 * reference_time / n,
+    }
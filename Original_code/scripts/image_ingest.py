@@ -0,0 +1,115 @@
+import base64
+import struct
+
+import cv2
+import numpy as np
+
+
+# Uploads are decoded at the smallest power-of-two reduction whose longest side
+# is still at least this big. Detection runs at 640 px anyway (DETECT_MAX_SIDE),
+# and a kiosk face (>= 27% of the frame width) still crops to >= 160 px.
+INGEST_MIN_SIDE = 640
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# start-of-frame markers carry the image size; C4/C8/CC are other segments
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """``(width, height)`` from a JPEG's SOF header without decoding it, or None."""
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    i = 2
+    while i + 4 <= len(view):
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # end of image / start of scan: no SOF found
+            return None
+        (length,) = struct.unpack_from(">H", view, i + 2)
+        if marker in _SOF_MARKERS and i + 9 <= len(view):
+            height, width = struct.unpack_from(">HH", view, i + 5)
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduction_for(width, height, min_side=INGEST_MIN_SIDE):
+    """Largest power-of-two factor (1, 2, 4 or 8) that keeps the longest side >= ``min_side``."""
+    longest = max(width, height)
+    for factor, _ in _REDUCED_FLAGS:
+        if longest // factor >= min_side:
+            return factor
+    return 1
+
+
+def decode_image(data, min_side=INGEST_MIN_SIDE):
+    """Decode encoded image bytes; returns ``(image, factor)`` or ``(None, 1)``.
+
+    JPEGs are decoded straight at a reduced size (libjpeg scales while it
+    decodes, so the full-resolution bitmap never exists); ``factor`` is how
+    much smaller the image is than the original, for mapping boxes back.
+    """
+    if not data:
+        return None, 1
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    size = jpeg_size(data)
+    factor = reduction_for(*size, min_side=min_side) if size else 1
+    flag = dict(_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    img = cv2.imdecode(buffer, flag)
+    if img is None and factor != 1:
+        factor, img = 1, cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    return img, factor
+
+
+def data_url_bytes(data_url):
+    """Raw bytes of a ``data:...;base64,`` URL (or bare base64), or None if malformed."""
+    if not data_url:
+        return None
+    try:
+        encoded = data_url.split(",", 1)[1] if data_url.startswith("data:") else data_url
+        return base64.b64decode(encoded)
+    except (ValueError, TypeError, IndexError):
+        return None
+
+
+def read_upload(file_storage):
+    """Encoded bytes of one werkzeug upload part.
+
+    cv2.imdecode needs the whole encoded image, so each part is read into
+    memory in full; only the request body size is bounded (MAX_CONTENT_LENGTH).
+    """
+    return file_storage.stream.read()
+
+
+def iter_frames(sources, min_side=INGEST_MIN_SIDE):
+    """Decode frames one at a time from a mutable list of uploads, data URLs or bytes.
+
+    Each list slot is cleared as soon as it has been decoded, so only one
+    decoded frame (plus whatever the caller keeps) is held at a time, rather
+    than every decoded frame of the request. The encoded inputs are not
+    streamed: multipart parts are spooled by werkzeug and read one by one, but
+    a JSON body and all of its data URL strings are parsed into memory before
+    the first frame is decoded.
+    """
+    for i in range(len(sources)):
+        source, sources[i] = sources[i], None
+        if hasattr(source, "stream"):
+            source = read_upload(source)
+        elif isinstance(source, str):
+            source = data_url_bytes(source)
+        img, _ = decode_image(source, min_side=min_side)
+        del source
+        if img is not None:
+            yield img
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchScheduler:
+    """The single executor for FaceNet: coalesces calls from concurrent requests into batches.
+
+    Each request thread calls ``embed(crop)`` (or ``embed_batch(crops)`` for
+    bulk enrollment) and blocks on a Future. One worker thread takes the first
+    queued item, keeps collecting for up to ``max_wait_ms`` or until
+    ``max_batch_size`` crops are waiting, runs ``embed_fn`` once on the stacked
+    crops and hands every caller its rows. ``embed_fn`` is only ever called from
+    that thread, so the model is never run concurrently.
+    ``on_batch(size, seconds)``, if given, is told about every batch that ran.
+    """
+
+    def __init__(self, embed_fn, max_batch_size=16, max_wait_ms=5.0, on_batch=None):
+        self.embed_fn = embed_fn
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(self, crop) -> Future:
+        """Queue one 160x160 crop; the Future resolves to its embedding."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((np.expand_dims(crop, 0), future, True))
+        return future
+
+    def submit_batch(self, crops) -> Future:
+        """Queue several crops at once; the Future resolves to their ``(N, dim)`` embeddings.
+
+        A batch is never split, so it may make a forward pass larger than ``max_batch_size``.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((np.stack(crops), future, False))
+        return future
+
+    def embed(self, crop, timeout=None):
+        return self.submit(crop).result(timeout=timeout)
+
+    def embed_batch(self, crops, timeout=None):
+        if len(crops) == 0:
+            return []
+        return list(self.submit_batch(crops).result(timeout=timeout))
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # window closed: still take whatever already arrived
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            rows += len(batch[-1][0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            crops = np.concatenate([item[0] for item in batch])
+            started = time.perf_counter()
+            try:
+                embeddings = self.embed_fn(crops)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            if self.on_batch is not None:
+                try:
+                    self.on_batch(len(crops), time.perf_counter() - started)
+                except Exception:
+                    pass
+            start = 0
+            for item_crops, future, single in batch:
+                rows = embeddings[start:start + len(item_crops)]
+                start += len(item_crops)
+                future.set_result(rows[0] if single else rows)
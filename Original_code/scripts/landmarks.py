@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+
+# 68-point iBUG layout used by shape_predictor_68_face_landmarks.dat
+LANDMARK_COUNT = 68
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+EYES = slice(36, 48)
+
+
+def shape_to_array(shape, dtype=np.int32):
+    """dlib ``full_object_detection`` -> ``(68, 2)`` array in a single pass over ``shape.parts()``.
+
+    dlib points expose no buffer, so this is as direct as it gets: one
+    ``np.fromiter`` fill instead of 68 ``shape.part(i)`` calls and a list of tuples.
+    """
+    parts = shape.parts()
+    count = len(parts)
+    flat = np.fromiter((v for p in parts for v in (p.x, p.y)), dtype=dtype, count=2 * count)
+    return flat.reshape(count, 2)
+
+
+def _rect(box):
+    import dlib
+    x, y, w, h = (int(v) for v in box)
+    return dlib.rectangle(x, y, x + w, y + h)
+
+
+def eye_aspect_ratios(points):
+    """Per-eye EAR of ``(..., 68, 2)`` landmarks (one face or a batch); returns ``(..., 2)``.
+
+    EAR = (|p2-p6| + |p3-p5|) / (2 |p1-p4|) for each eye's six points.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    eyes = points[..., EYES, :].reshape(points.shape[:-2] + (2, 6, 2))
+    vertical = (np.linalg.norm(eyes[..., 1, :] - eyes[..., 5, :], axis=-1)
+                + np.linalg.norm(eyes[..., 2, :] - eyes[..., 4, :], axis=-1))
+    horizontal = np.linalg.norm(eyes[..., 0, :] - eyes[..., 3, :], axis=-1)
+    return vertical / (2.0 * np.maximum(horizontal, 1e-6))
+
+
+def mean_ear(points):
+    """Average of both eyes' EAR: a float for one face, an array for a batch of frames."""
+    ears = eye_aspect_ratios(points).mean(axis=-1)
+    return float(ears) if ears.ndim == 0 else ears
+
+
+class FrameLandmarks:
+    """Landmarks of one frame, computed at most once per face and shared between stages.
+
+    The grayscale image is converted once (or taken from the detector that
+    already made it) and reused for every predictor call; ``points(box)`` is
+    cached per box, so detection, liveness and alignment can all ask for the
+    same face without re-running dlib; ``cache`` holds what those stages
+    derive from it.
+    """
+
+    def __init__(self, frame, predictor, gray=None):
+        self.frame = frame
+        self.predictor = predictor
+        self._gray = gray
+        self._points = {}
+        # per-frame results of later stages (e.g. aligned crops), keyed by the stage
+        self.cache = {}
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY) if self.frame.ndim == 3 else self.frame
+        return self._gray
+
+    def points(self, box):
+        """``(68, 2)`` int32 landmarks for the face in ``box``, or None without a predictor."""
+        key = tuple(int(v) for v in box)
+        if key not in self._points:
+            if self.predictor is None:
+                self._points[key] = None
+            else:
+                try:
+                    self._points[key] = shape_to_array(self.predictor(self.gray, _rect(key)))
+                except Exception as e:
+                    print(f"[LANDMARKS] Predictor failed: {e}")
+                    self._points[key] = None
+        return self._points[key]
+
+    def eyes(self, box):
+        """``(2, 6, 2)`` left/right eye points, or None."""
+        points = self.points(box)
+        return None if points is None else points[EYES].reshape(2, 6, 2)
+
+    def ear(self, box):
+        points = self.points(box)
+        return None if points is None else mean_ear(points)
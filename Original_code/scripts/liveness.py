@@ -0,0 +1,164 @@
+import time
+
+import cv2
+
+
+# Eye aspect ratio below CLOSED counts as a closed eye, above OPEN as an open
+# one; a blink is open -> closed -> open within the scanned frames.
+EAR_CLOSED_THRESHOLD = 0.21
+EAR_OPEN_THRESHOLD = 0.25
+# Fresh camera frames scored per check, and the wall-clock cap on reading them
+LIVENESS_MAX_FRAMES = 45
+LIVENESS_TIMEOUT = 3.0
+# Face crops handed to the anti-spoof model when no blink was seen; any one
+# judged real passes
+ANTI_SPOOF_MAX_CALLS = 3
+
+
+class LivenessResult:
+    """Outcome of one liveness check; truthy when the face was judged live.
+
+    ``method`` is what decided it: "blink" (landmark gate), "anti_spoof" (the
+    model), or None when neither could run (no face, camera stopped).
+    """
+
+    def __init__(self, is_real, method=None, frames=0, reason="", blinks=0, model_calls=0):
+        self.is_real = is_real
+        self.method = method
+        self.frames = frames
+        self.reason = reason
+        self.blinks = blinks
+        self.model_calls = model_calls
+
+    def __bool__(self):
+        return bool(self.is_real)
+
+    def to_dict(self):
+        return {
+            "is_real": bool(self.is_real),
+            "method": self.method,
+            "frames": self.frames,
+            "reason": self.reason,
+            "blinks": self.blinks,
+            "model_calls": self.model_calls,
+        }
+
+    def __repr__(self):
+        return f"LivenessResult(is_real={self.is_real}, method={self.method!r}, frames={self.frames})"
+
+
+def count_blinks(ears, closed=EAR_CLOSED_THRESHOLD, opened=EAR_OPEN_THRESHOLD):
+    """Open -> closed -> open transitions in a sequence of EAR values (None = no reading)."""
+    blinks = 0
+    state = None  # "open" / "closed"
+    for ear in ears:
+        if ear is None:
+            continue
+        if ear >= opened:
+            if state == "closed":
+                blinks += 1
+            state = "open"
+        elif ear <= closed and state == "open":
+            state = "closed"
+    return blinks
+
+
+def deepface_anti_spoof(face_crop):
+    """DeepFace's anti-spoofing verdict for one BGR face crop: True, False, or None on failure."""
+    try:
+        from deepface import DeepFace
+        result = DeepFace.extract_faces(
+            img_path=face_crop,
+            detector_backend="skip",  # the crop is already a face; don't detect again
+            enforce_detection=False,
+            anti_spoofing=True,
+        )
+    except Exception as e:
+        print(f"[LIVENESS] Anti-spoof model failed: {e}")
+        return None
+    return bool(result and result[0].get("is_real", False))
+
+
+class LivenessChecker:
+    """Scores a bounded number of fresh camera frames for liveness.
+
+    The cheap gate comes first: for every new frame, ``detect_fn(frame, gray)``
+    finds the face and ``ear_fn(frame, gray, box)`` returns its eye aspect ratio
+    (or None). A blink passes immediately. Only when no blink is seen within
+    ``max_frames`` frames or ``timeout`` seconds is ``anti_spoof_fn(crop)`` run,
+    on at most ``max_model_calls`` of the sharpest face crops from the scan.
+
+    ``camera`` is anything with ``read(after_seq, timeout) -> (seq, frame)``,
+    e.g. camera.CameraSession; each frame is scored once.
+    """
+
+    def __init__(self, camera, detect_fn, ear_fn, anti_spoof_fn=deepface_anti_spoof,
+                 max_frames=LIVENESS_MAX_FRAMES, timeout=LIVENESS_TIMEOUT,
+                 max_model_calls=ANTI_SPOOF_MAX_CALLS):
+        self.camera = camera
+        self.detect_fn = detect_fn
+        self.ear_fn = ear_fn
+        self.anti_spoof_fn = anti_spoof_fn
+        self.max_frames = max_frames
+        self.timeout = timeout
+        self.max_model_calls = max_model_calls
+
+    def check(self, on_frame=None):
+        """Run one check; ``on_frame(frame, box, ear)`` is called per scored frame (for a preview window)."""
+        deadline = time.monotonic() + self.timeout
+        seq, _ = self.camera.latest() if hasattr(self.camera, "latest") else (0, None)
+        ears = []
+        crops = []  # (sharpness, crop) candidates for the anti-spoof model
+        frames = 0
+
+        while frames < self.max_frames:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            seq, frame = self.camera.read(after_seq=seq, timeout=min(remaining, 1.0))
+            if frame is None:
+                if remaining <= 1.0:
+                    break
+                continue
+            frames += 1
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            box = self.detect_fn(frame, gray)
+            ear = None
+            if box is not None:
+                ear = self.ear_fn(frame, gray, box)
+                x, y, w, h = (int(v) for v in box)
+                face = gray[y:y + h, x:x + w]
+                if face.size:
+                    sharpness = float(cv2.Laplacian(face, cv2.CV_64F).var())
+                    crops.append((sharpness, frame[y:y + h, x:x + w].copy()))
+                    # only the best few are ever used
+                    crops.sort(key=lambda item: item[0], reverse=True)
+                    del crops[self.max_model_calls:]
+            ears.append(ear)
+            if on_frame is not None:
+                on_frame(frame, box, ear)
+
+            blinks = count_blinks(ears)
+            if blinks:
+                return LivenessResult(True, "blink", frames, "Blink detected", blinks=blinks)
+
+        if not crops:
+            reason = "No face in view" if frames else "Camera returned no frames"
+            return LivenessResult(False, None, frames, reason)
+        if self.anti_spoof_fn is None:
+            return LivenessResult(False, None, frames, "No blink detected")
+
+        # landmark gate inconclusive: fall back to the heavy model
+        calls = 0
+        verdicts = []
+        for _, crop in crops:
+            calls += 1
+            verdict = self.anti_spoof_fn(crop)
+            verdicts.append(verdict)
+            if verdict:
+                return LivenessResult(True, "anti_spoof", frames, "Anti-spoof model passed", model_calls=calls)
+        if all(v is None for v in verdicts):
+            return LivenessResult(False, None, frames, "Anti-spoof model unavailable", model_calls=calls)
+        return LivenessResult(False, "anti_spoof", frames, "Spoof suspected", model_calls=calls)
+
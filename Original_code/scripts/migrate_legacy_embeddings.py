@@ -0,0 +1,64 @@
+"""One-off conversion of legacy ``<name>_embedding.pkl`` files to ``.npy``.
+
+Usage: py migrate_legacy_embeddings.py [DATASET_DIR] [--remove]
+
+facial_recognition.py no longer unpickles anything: users that only have a
+pickled embedding are skipped until this has been run. Unpickling can execute
+arbitrary code, so only run it on a dataset folder you trust. Each pickle must
+hold a single embedding vector; anything else is reported and left alone.
+``--remove`` deletes every .pkl that was converted.
+"""
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from dataset_gallery import embedding_path, legacy_path, save_embedding
+
+
+# Same default as facial_recognition.DATASET_DIR (not imported: that loads the models)
+DEFAULT_DATASET_DIR = r"C:\TechNest_Rec_Dataset"
+EMBEDDING_DIM = 512
+
+
+def convert_user(dataset_dir, name, remove=False):
+    """Convert one user's .pkl; returns True if an .npy was written."""
+    pkl_path = legacy_path(dataset_dir, name)
+    npy_path = embedding_path(dataset_dir, name)
+    if not os.path.exists(pkl_path):
+        return False
+    if os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(pkl_path):
+        print(f"[MIGRATE] {name}: .npy is already up to date")
+        return False
+    try:
+        with open(pkl_path, "rb") as f:
+            embedding = np.asarray(pickle.load(f), dtype=np.float32).ravel()
+    except Exception as e:
+        print(f"[MIGRATE] {name}: could not read {pkl_path}: {e}")
+        return False
+    if embedding.size != EMBEDDING_DIM:
+        print(f"[MIGRATE] {name}: expected {EMBEDDING_DIM} values, found {embedding.size}; skipped")
+        return False
+    save_embedding(dataset_dir, name, embedding)
+    if remove:
+        os.remove(pkl_path)
+    print(f"[MIGRATE] {name}: converted")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset_dir", nargs="?", default=DEFAULT_DATASET_DIR)
+    parser.add_argument("--remove", action="store_true", help="delete each .pkl once converted")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset_dir):
+        parser.error(f"{args.dataset_dir} is not a directory")
+    names = sorted(entry.name for entry in os.scandir(args.dataset_dir) if entry.is_dir())
+    converted = sum(convert_user(args.dataset_dir, name, remove=args.remove) for name in names)
+    print(f"[MIGRATE] Converted {converted} legacy embeddings in {args.dataset_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PhotoFetcher:
+    """Concurrent photo downloader over one connection-pooled ``requests.Session``.
+
+    Keep-alive connections are reused across photos, at most ``per_host``
+    requests run against any one host, transient failures are retried with
+    backoff, and results are handed back as soon as they are ready so the
+    caller can detect/embed while the remaining downloads are in flight.
+    """
+
+    def __init__(self, max_workers=8, per_host=4, timeout=(3, 8), retries=2, hosts=4):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        # pool_connections is how many per-host pools are cached (photos usually come
+        # from the PHP host alone); pool_maxsize is the keep-alive connections per host,
+        # which the per-host semaphore below never exceeds
+        adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=per_host, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._host_lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            return self._host_slots[host]
+
+    def fetch(self, url, timeout=None):
+        """Download ``url`` and return its bytes, or None on any failure."""
+        try:
+            with self._slot(url):
+                resp = self.session.get(url, timeout=timeout or self.timeout)
+            if resp.status_code == 200:
+                return resp.content
+            print(f"[DOWNLOAD ERROR] {url} returned HTTP {resp.status_code}")
+        except Exception as e:
+            print(f"[DOWNLOAD ERROR] Could not download {url}: {e}")
+        return None
+
+    def fetch_groups(self, groups):
+        """Download several groups of URLs (e.g. one group per user) in parallel.
+
+        ``groups`` is an iterable of ``(key, [url, ...])``. Yields
+        ``(key, [(url, content_or_None), ...])`` with URLs in their original
+        order, as soon as every download of that group has finished.
+        """
+        urls_by_key = {key: list(urls) for key, urls in groups}
+        if not urls_by_key:
+            return
+
+        remaining = {key: len(urls) for key, urls in urls_by_key.items()}
+        results = {key: [None] * len(urls) for key, urls in urls_by_key.items()}
+
+        # groups without any URL are complete already
+        for key, urls in urls_by_key.items():
+            if not urls:
+                yield key, []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="photo-fetch") as pool:
+            futures = {
+                pool.submit(self.fetch, url): (key, idx)
+                for key, urls in urls_by_key.items()
+                for idx, url in enumerate(urls)
+            }
+            for future in as_completed(futures):
+                key, idx = futures[future]
+                results[key][idx] = future.result()
+                remaining[key] -= 1
+                if remaining[key] == 0:
+                    yield key, list(zip(urls_by_key[key], results.pop(key)))
@@ -4,13 +4,22 @@ import json
 import time
 import argparse
 import base64
-import requests
+import contextlib
+import socket
+import socketserver
+import threading
 
 try:
     import cv2
     import numpy as np
-    from keras_facenet import FaceNet
-    import dlib
+    from gallery import Gallery, select_templates
+    from image_ingest import decode_image
+    from face_detection import detect_faces, face_size_bounds, largest_face
+    from landmarks import FrameLandmarks
+    from alignment import ALIGN_FACES, align_face, embedding_model_id
+    from embedding_store import EmbeddingStore, content_hash, photo_fingerprint, user_key
+    from photo_fetcher import PhotoFetcher
+    from user_directory import UserDirectory
 except Exception as e:
     print(json.dumps({"status": "error", "message": f"Missing python deps: {e}"}))
     sys.exit(1)
@@ -27,9 +36,31 @@ os.makedirs(FRONTEND_UPLOAD_DIR, exist_ok=True)
 PHP_API_URL = 'http://localhost/api'
 
 SAMPLES_REQUIRED = 1
+# Max crops per FaceNet forward pass while bootstrapping the gallery
+EMBED_BATCH_SIZE = 32
+# Photos per user embedded as template candidates while bootstrapping
+MAX_PHOTOS_PER_USER = 10
+# Upper bound on faces recognized in one image with --multi
+MAX_FACES_PER_FRAME = 16
+
+# Warm worker (see serve_worker): keeps models and the gallery loaded between scans
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = int(os.environ.get('TECHNEST_WORKER_PORT', '5002'))
+WORKER_CONNECT_TIMEOUT = 0.5
+# A warm worker answers a scan in well under a second; past this the scan fails
+# instead of falling back to a cold in-process load that would double the wait
+WORKER_REQUEST_TIMEOUT = 10
+# --reload re-downloads and re-embeds changed photos, so it gets longer
+WORKER_RELOAD_TIMEOUT = 120
+# The worker polls the roster this often and refreshes its gallery on changes (0 disables)
+USER_SYNC_INTERVAL = float(os.environ.get('TECHNEST_USER_SYNC_SECONDS', '5'))
 
 
 def load_models():
+    # heavy imports are deferred so the thin client never pays for TensorFlow
+    from keras_facenet import FaceNet
+    import dlib
+
     if not os.path.exists(HAAR_PATH):
 
         possible = os.path.join(REPO_ROOT, 'Original_code', 'resources', 'haar_face.xml')
@@ -53,54 +84,79 @@ def load_models():
     return haar, embedder, predictor
 
 
-def get_landmarks(predictor, frame, box):
+def get_landmarks(predictor, frame, box, gray=None):
+    """68 ``[x, y]`` landmark pairs for ``box`` (empty without a predictor); pass the detector's ``gray``."""
     if predictor is None:
         return []
-    x, y, w, h = box
-    # convert to dlib rectangle 
-    rect_ctor = getattr(dlib, 'rectangle', None)
-    if rect_ctor is None:
-        class _Rect:
-            def __init__(self, left, top, right, bottom):
-                self.left = left
-                self.top = top
-                self.right = right
-                self.bottom = bottom
-        rect = _Rect(int(x), int(y), int(x + w), int(y + h))
-    else:
-        rect = rect_ctor(int(x), int(y), int(x + w), int(y + h))
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    try:
-        shape = predictor(gray, rect)
-        pts = [(int(shape.part(i).x), int(shape.part(i).y)) for i in range(68)]
-        return pts
-    except Exception:
-        return []
+    pts = FrameLandmarks(frame, predictor, gray=gray).points(box)
+    return [] if pts is None else pts.tolist()
+
 
+def detect_face(haar, frame, kiosk=True, gray=None):
+    # downscaled detection; kiosk frames only search face sizes plausible at the kiosk distance
+    min_face, max_face = face_size_bounds(frame.shape[1]) if kiosk else (60, None)
+    return largest_face(detect_faces(haar, frame, gray=gray, min_face=min_face, max_face=max_face))
 
-def detect_face(haar, frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = haar.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(60, 60))
-    return max(faces, key=lambda b: b[2] * b[3]) if len(faces) > 0 else None
 
+def detect_all_faces(haar, frame, kiosk=True, max_faces=MAX_FACES_PER_FRAME):
+    min_face, max_face = face_size_bounds(frame.shape[1]) if kiosk else (60, None)
+    boxes = detect_faces(haar, frame, min_face=min_face, max_face=max_face)
+    return [tuple(int(v) for v in box) for box in boxes[:max_faces]]
 
-def get_embedding(embedder, frame, box):
+
+def crop_face(frame, box, predictor=None, landmarks=None):
+    """160x160 FaceNet input: eye-aligned with margin, same as server.py (see alignment.py)."""
+    if ALIGN_FACES:
+        if landmarks is None:
+            landmarks = FrameLandmarks(frame, predictor)
+        return align_face(frame, box, landmarks)
     x, y, w, h = box
     face_crop = frame[y:y+h, x:x+w]
     if face_crop.size == 0:
         return None
-    face_crop = cv2.resize(face_crop, (160, 160))
+    return cv2.resize(face_crop, (160, 160))
+
+
+def get_embedding(embedder, frame, box, predictor=None, landmarks=None):
+    face_crop = crop_face(frame, box, predictor, landmarks)
+    if face_crop is None:
+        return None
     return embedder.embeddings([face_crop])[0]
 
 
-def bootstrap_users(haar, embedder):
+def get_embeddings(embedder, crops, batch_size=EMBED_BATCH_SIZE, model_lock=None):
+    """Embed many 160x160 face crops, one FaceNet forward pass per batch (each under ``model_lock``)."""
+    model_lock = model_lock or contextlib.nullcontext()
+    embeddings = []
+    for start in range(0, len(crops), batch_size):
+        batch = np.stack(crops[start:start + batch_size])
+        with model_lock:
+            embeddings.extend(embedder.embeddings(batch))
+    return embeddings
+
+
+def bootstrap_users(haar, embedder, store=None, directory=None, refresh=True, predictor=None, model_lock=None):
+    """Build {name: info} for every PHP user, reusing cached embeddings when photos are unchanged.
+
+    ``model_lock`` is held around every detector, predictor and FaceNet call,
+    so the worker can rebuild its gallery while it keeps answering scans.
+    """
+    model_lock = model_lock or contextlib.nullcontext()
+    if store is None:
+        store = EmbeddingStore(model_id=embedding_model_id())
+        store.load()
+    if directory is None:
+        directory = UserDirectory(PHP_API_URL, timeout=8)
+
     users = {}
+    changed = {}  # key -> (name, info, fingerprint, photo urls) for users that need re-embedding
+    pending = []  # (key, slot, crop) awaiting one batched embed
+    fetcher = PhotoFetcher(max_workers=8, per_host=4, timeout=(3, 6))
     try:
-        r = requests.get(f"{PHP_API_URL}/get-state", timeout=8)
-        if not r.ok:
-            return users
-        payload = r.json()
-        user_list = payload.get('users', []) if isinstance(payload, dict) else []
+        if refresh and directory.sync() is None and not directory.loaded:
+            return store.users_data()
+        user_list = directory.users()
+        seen_keys = set()
         for user in user_list:
             name = user.get('name')
             if not name:
@@ -109,72 +165,107 @@ def bootstrap_users(haar, embedder):
             # try parsing JSON string of photo urls
             try:
                 photo_urls = json.loads(photos) if isinstance(photos, str) else photos or []
-            except Exception:
+            except Exception as e:
+                print(f"DEBUG: Unreadable photo list for {name}: {e}", file=sys.stderr)
                 photo_urls = []
 
-            best_emb = None
-            for url in (photo_urls or []):
-                if not url:
+            info = {
+                'id': user.get('id') or user.get('user_id'),
+                'role': user.get('role'),
+                'dept': user.get('dept'),
+            }
+            key = user_key(user)
+            fingerprint = photo_fingerprint(photo_urls)
+            seen_keys.add(key)
+
+            cached = store.get(key, fingerprint)
+            if cached is not None:
+                users[name] = {**cached['info'], **info, 'embedding': cached['templates'][0],
+                               'templates': cached['templates']}
+                continue
+
+            urls = [f"http://localhost{u}" if u.startswith('/') else u for u in photo_urls if u]
+            changed[key] = (name, info, fingerprint, urls)
+
+        # download every changed user's photos concurrently and detect faces as each user completes
+        groups = [(key, item[3]) for key, item in changed.items()]
+        staged = {}  # key -> (name, info, fingerprint, embeddings, photo hashes)
+        for key, downloads in fetcher.fetch_groups(groups):
+            name, info, fingerprint, _ = changed[key]
+            embeddings, hashes = [], []
+            # every photo with a face is a template candidate
+            for _, content in downloads:
+                if not content or len(embeddings) >= MAX_PHOTOS_PER_USER:
                     continue
-                # try to download
                 try:
-                    # build local URL if necessary
-                    if url.startswith('/'):
-                        url = f"http://localhost{url}"
-                    tmp = requests.get(url, timeout=6)
-                    if not tmp.ok:
-                        continue
-                    arr = np.frombuffer(tmp.content, dtype=np.uint8)
-                    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-                    if img is None:
-                        continue
-                    box = detect_face(haar, img)
-                    if box is None:
-                        continue
-                    emb = get_embedding(embedder, img, box)
-                    if emb is not None:
-                        best_emb = emb
-                        break
-                except Exception:
+                    photo_hash = content_hash(content)
+                    emb = store.find_by_photo_hash(photo_hash)
+                    if emb is None:
+                        arr = np.frombuffer(content, dtype=np.uint8)
+                        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+                        if img is None:
+                            continue
+                        with model_lock:
+                            box = detect_face(haar, img, kiosk=False)
+                            crop = crop_face(img, box, predictor) if box is not None else None
+                        if crop is None:
+                            continue
+                        pending.append((key, len(embeddings), crop))
+                    embeddings.append(emb)
+                    hashes.append(photo_hash)
+                except Exception as e:
+                    print(f"DEBUG: Skipping a photo of {name}: {e}", file=sys.stderr)
                     continue
 
-            if best_emb is not None:
-                users[name] = {
-                    'id': user.get('id') or user.get('user_id'),
-                    'role': user.get('role'),
-                    'dept': user.get('dept'),
-                    'embedding': best_emb
-                }
-    except Exception:
-        pass
+            if embeddings:
+                staged[key] = (name, info, fingerprint, embeddings, hashes)
+            else:
+                store.remove(key)
+
+        embedded = get_embeddings(embedder, [item[-1] for item in pending], model_lock=model_lock)
+        for (key, slot, _), emb in zip(pending, embedded):
+            staged[key][3][slot] = emb
+
+        for key, (name, info, fingerprint, embeddings, hashes) in staged.items():
+            templates, chosen = select_templates(embeddings)
+            store.put(key, name, templates, info=info, fingerprint=fingerprint,
+                      photo_hashes=[hashes[i] for i in chosen])
+            users[name] = {**info, 'embedding': templates[0], 'templates': templates}
+
+        store.prune(seen_keys)
+        store.save()
+    except Exception as e:
+        # PHP unreachable: fall back to the last known gallery
+        print(f"DEBUG: Bootstrap failed, using cached gallery: {e}", file=sys.stderr)
+        if not users:
+            return store.users_data()
     return users
 
 
-def recognize_image(image_path, haar, embedder, users_data, threshold=1.0):
-    img = cv2.imread(image_path)
+def read_image(image_path):
+    """Load an image at reduced resolution (see image_ingest.py); returns ``(image, factor)``."""
+    try:
+        with open(image_path, 'rb') as f:
+            return decode_image(f.read())
+    except OSError:
+        return None, 1
+
+
+def recognize_image(image_path, haar, embedder, gallery, threshold=1.0, predictor=None):
+    img, _ = read_image(image_path)
     if img is None:
         return {'status': 'error', 'message': 'Image unreadable'}
-    box = detect_face(haar, img)
+    box = detect_face(haar, img, kiosk=False)
     if box is None:
         return {'status': 'unrecognized', 'message': 'No face detected'}
-    emb = get_embedding(embedder, img, box)
+    emb = get_embedding(embedder, img, box, predictor)
     if emb is None:
         return {'status': 'error', 'message': 'Failed to extract features'}
 
-    best = (None, float('inf'))
-    for name, info in users_data.items():
-        db_emb = info.get('embedding')
-        if db_emb is None:
-            continue
-        try:
-            dist = float(np.linalg.norm(emb - db_emb))
-        except Exception:
-            continue
-        if dist < best[1]:
-            best = (name, dist)
+    best = gallery.best_match(emb)
 
     if best[0] and best[1] < threshold:
-        info = users_data[best[0]]
+        info = gallery.get_info(best[0])
         return {
             'status': 'success',
             'name': best[0],
@@ -188,39 +279,34 @@ def recognize_image(image_path, haar, embedder, users_data, threshold=1.0):
     return {'status': 'forbidden', 'user': None}
 
 
-def recognize_image_with_landmarks(image_path, haar, embedder, predictor, users_data, threshold=1.0):
+def recognize_image_with_landmarks(image_path, haar, embedder, predictor, gallery, threshold=1.0):
     """Run recognition and also return detected 68-point landmarks (if predictor available).
 
     The returned dict will include a 'landmarks' key with list of [x,y] pairs (may be empty).
     """
-    img = cv2.imread(image_path)
+    img, factor = read_image(image_path)
     if img is None:
         return {'status': 'error', 'message': 'Image unreadable', 'landmarks': []}
-    box = detect_face(haar, img)
+    # one grayscale conversion shared by the detector and the landmark predictor
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    box = detect_face(haar, img, kiosk=False, gray=gray)
     if box is None:
         return {'status': 'unrecognized', 'message': 'No face detected', 'landmarks': []}
 
-    # compute landmarks 
-    pts = get_landmarks(predictor, img, box) if predictor is not None else []
+    # compute landmarks once; alignment below reuses them
+    landmarks = FrameLandmarks(img, predictor, gray=gray)
+    pts = landmarks.points(box) if predictor is not None else None
+    # report landmarks in the coordinates of the uploaded image
+    pts = [] if pts is None else [(x * factor, y * factor) for x, y in pts.tolist()]
 
-    emb = get_embedding(embedder, img, box)
+    emb = get_embedding(embedder, img, box, landmarks=landmarks)
     if emb is None:
         return {'status': 'error', 'message': 'Failed to extract features', 'landmarks': pts}
 
-    best = (None, float('inf'))
-    for name, info in users_data.items():
-        db_emb = info.get('embedding')
-        if db_emb is None:
-            continue
-        try:
-            dist = float(np.linalg.norm(emb - db_emb))
-        except Exception:
-            continue
-        if dist < best[1]:
-            best = (name, dist)
+    best = gallery.best_match(emb)
 
     if best[0] and best[1] < threshold:
-        info = users_data[best[0]]
+        info = gallery.get_info(best[0])
         return {
             'status': 'success',
             'name': best[0],
@@ -235,12 +321,202 @@ def recognize_image_with_landmarks(image_path, haar, embedder, predictor, users_
     return {'status': 'forbidden', 'user': None, 'landmarks': pts}
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--image', required=True, help='Path to image file')
-    parser.add_argument('--threshold', type=float, default=1.0)
-    args = parser.parse_args()
+def recognize_image_multi(image_path, haar, embedder, gallery, threshold=1.0, predictor=None):
+    """Recognize every face in the image; each enrolled user is matched to at most one face."""
+    img, factor = read_image(image_path)
+    if img is None:
+        return {'status': 'error', 'message': 'Image unreadable', 'faces': []}
+
+    boxes, crops = [], []
+    landmarks = FrameLandmarks(img, predictor)
+    for box in detect_all_faces(haar, img, kiosk=False):
+        crop = crop_face(img, box, landmarks=landmarks)
+        if crop is not None:
+            boxes.append(box)
+            crops.append(crop)
+    if not crops:
+        return {'status': 'unrecognized', 'message': 'No face detected', 'faces': []}
+
+    faces = []
+    matches = gallery.assign(get_embeddings(embedder, crops), threshold)
+    for box, (name, dist) in zip(boxes, matches):
+        x, y, w, h = (v * factor for v in box)
+        info = gallery.get_info(name) if name else {}
+        faces.append({
+            'box': {'x': x, 'y': y, 'w': w, 'h': h},
+            'recognized': name is not None,
+            'name': name,
+            'id': info.get('id'),
+            'role': info.get('role'),
+            'dept': info.get('dept'),
+            'confidence': float(max(0.0, 1.0 - dist)),
+            'distance': float(dist) if np.isfinite(dist) else None,
+        })
+    recognized = sum(face['recognized'] for face in faces)
+    return {'status': 'success' if recognized else 'forbidden', 'recognized': recognized, 'faces': faces}
+
+
+def _matching_names(gallery, user_id=None, name=None):
+    return [n for n, info in gallery.info.items()
+            if (name and n == name) or (user_id and str(info.get('id')) == str(user_id))]
+
+
+class _WorkerState:
+    """Models and gallery shared by every connection to the warm worker."""
+
+    def __init__(self):
+        self.haar, self.embedder, self.predictor = load_models()
+        # TensorFlow and the dlib predictor are not safe to share across threads
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        # Guards gallery swaps and removals; held only briefly, never across a bootstrap
+        self.update_lock = threading.Lock()
+        # Removals made while a reload runs, replayed onto the gallery it installs; None when idle
+        self.pending_removals = None
+        self.store = EmbeddingStore(model_id=embedding_model_id())
+        self.store.load()
+        self.directory = UserDirectory(PHP_API_URL, poll_interval=USER_SYNC_INTERVAL, timeout=8)
+        self.gallery = Gallery.from_users(bootstrap_users(self.haar, self.embedder, self.store, self.directory,
+                                                                 predictor=self.predictor))
+        print(f"DEBUG: Worker loaded {len(self.gallery)} users with embeddings", file=sys.stderr)
+        # new registrations show up within a poll interval, no --reload needed
+        self.directory.start(on_change=lambda result: self.reload(refresh=False))
+
+    def _forget(self, user_id, names):
+        if user_id:
+            self.store.remove(user_key({'id': user_id}))
+        for n in names:
+            self.store.remove(user_key({'name': n}))
+
+    def reload(self, refresh=True):
+        """Rebuild the gallery; scans keep matching the old one and share the models through ``self.lock``."""
+        with self.reload_lock:
+            with self.update_lock:
+                self.pending_removals = []
+            try:
+                users = bootstrap_users(self.haar, self.embedder, self.store, self.directory, refresh=refresh,
+                                        predictor=self.predictor, model_lock=self.lock)
+                gallery = Gallery.from_users(users)
+                with self.update_lock:
+                    for user_id, name, _ in self.pending_removals:
+                        for n in _matching_names(gallery, user_id, name):
+                            gallery.remove(n)
+                    self.gallery = gallery
+            finally:
+                # the bootstrap owned the store until now; drop what was deleted meanwhile
+                with self.update_lock:
+                    removals, self.pending_removals = self.pending_removals, None
+                    for user_id, _, names in removals:
+                        self._forget(user_id, names)
+                    if removals:
+                        self.store.save()
+        return {'status': 'ok', 'users': len(self.gallery)}
+
+    def remove(self, user_id=None, name=None):
+        """Drop a deleted user right away; Gallery.remove swaps in new arrays, so scans need no lock.
+
+        Never waits for a running reload: the removal is replayed onto the
+        gallery it installs, and its cache entries are dropped when it ends.
+        """
+        with self.update_lock:
+            gallery = self.gallery
+            names = _matching_names(gallery, user_id, name)
+            for n in names:
+                gallery.remove(n)
+            if self.pending_removals is not None:
+                self.pending_removals.append((user_id, name, names))
+            else:
+                self._forget(user_id, names)
+                self.store.save()
+        return {'status': 'ok', 'removed': names, 'users': len(gallery)}
+
+    def handle(self, payload):
+        op = payload.get('op', 'recognize')
+        if op == 'ping':
+            return {'status': 'ok', 'users': len(self.gallery)}
+        if op == 'reload':
+            return self.reload()
+        if op == 'remove':
+            return self.remove(payload.get('id'), payload.get('name'))
+        if op != 'recognize':
+            return {'status': 'error', 'message': f'Unknown op: {op}'}
+
+        image_path = payload.get('image')
+        if not image_path:
+            return {'status': 'error', 'message': 'Missing image path'}
+        threshold = float(payload.get('threshold', 1.0))
+        with self.lock:
+            if payload.get('multi'):
+                return recognize_image_multi(image_path, self.haar, self.embedder, self.gallery,
+                                             threshold=threshold, predictor=self.predictor)
+            return recognize_image_with_landmarks(image_path, self.haar, self.embedder,
+                                                  self.predictor, self.gallery, threshold=threshold)
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    """One JSON object per line in, one JSON object per line out."""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                payload = json.loads(line)
+                if not isinstance(payload, dict):
+                    raise ValueError('request must be a JSON object')
+                result = self.server.state.handle(payload)
+            except Exception as e:
+                result = {'status': 'error', 'message': str(e)}
+            self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class _WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_worker(host=WORKER_HOST, port=WORKER_PORT):
+    """Load models and the gallery once, then answer recognition requests over a local socket."""
+    state = _WorkerState()
+    with _WorkerServer((host, port), _WorkerHandler) as server:
+        server.state = state
+        print(f"DEBUG: Recognition worker listening on {host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
+
+def request_worker(payload, host=WORKER_HOST, port=WORKER_PORT, timeout=WORKER_REQUEST_TIMEOUT):
+    """Send one request to a running worker.
+
+    Returns None only when no worker is listening, so the caller can recognize
+    in-process; a worker that accepts the request but fails or times out gives
+    an error result instead.
+    """
+    try:
+        sock = socket.create_connection((host, port), timeout=WORKER_CONNECT_TIMEOUT)
+    except OSError:
+        return None
+
+    try:
+        sock.settimeout(timeout)
+        with sock, sock.makefile('rwb') as stream:
+            stream.write((json.dumps(payload) + '\n').encode('utf-8'))
+            stream.flush()
+            line = stream.readline()
+        if not line:
+            return {'status': 'error', 'message': 'Recognition worker closed the connection'}
+        return json.loads(line)
+    except socket.timeout:
+        return {'status': 'error', 'message': f'Recognition worker did not answer within {timeout}s'}
+    except (OSError, ValueError) as e:
+        return {'status': 'error', 'message': f'Recognition worker failed: {e}'}
+
+
+def recognize_in_process(image_path, threshold, multi=False):
     try:
         haar, embedder, predictor = load_models()
     except Exception as e:
@@ -248,7 +524,7 @@ def main():
         sys.exit(1)
 
     # bootstrap
-    users = bootstrap_users(haar, embedder)
+    users = bootstrap_users(haar, embedder, predictor=predictor)
     
     # Debugging puposes ni
     print(f"DEBUG: Loaded {len(users)} users with embeddings", file=sys.stderr)
@@ -256,7 +532,47 @@ def main():
         print(f"DEBUG: User: {name}", file=sys.stderr)
 
     # use the landmarks-aware recognizer so calling code may draw landmarks
-    result = recognize_image_with_landmarks(args.image, haar, embedder, predictor, users, threshold=args.threshold)
+    gallery = Gallery.from_users(users)
+    if multi:
+        return recognize_image_multi(image_path, haar, embedder, gallery, threshold=threshold, predictor=predictor)
+    return recognize_image_with_landmarks(image_path, haar, embedder, predictor, gallery, threshold=threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image', help='Path to image file')
+    parser.add_argument('--threshold', type=float, default=1.0)
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived recognition worker')
+    parser.add_argument('--reload', action='store_true', help='Ask a running worker to rebuild its gallery')
+    parser.add_argument('--port', type=int, default=WORKER_PORT, help='Worker port on localhost')
+    parser.add_argument('--no-worker', action='store_true', help='Always recognize in-process')
+    parser.add_argument('--multi', action='store_true', help='Recognize every face in the image')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_worker(port=args.port)
+        return
+
+    if args.reload:
+        result = request_worker({'op': 'reload'}, port=args.port, timeout=WORKER_RELOAD_TIMEOUT)
+        print(json.dumps(result or {'status': 'error', 'message': 'No recognition worker running'}))
+        return
+
+    if not args.image:
+        parser.error('--image is required')
+
+    result = None
+    if not args.no_worker:
+        # the worker may run from another directory, so always hand it an absolute path
+        result = request_worker({
+            'op': 'recognize',
+            'image': os.path.abspath(args.image),
+            'threshold': args.threshold,
+            'multi': args.multi,
+        }, port=args.port)
+
+    if result is None:
+        result = recognize_in_process(args.image, args.threshold, multi=args.multi)
     print(json.dumps(result))
 
 
@@ -0,0 +1,81 @@
+"""Production entry point: serve the Flask app with waitress instead of the debug server.
+
+    py Original_code/scripts/serve.py                    # server.py on 0.0.0.0:5001
+    py Original_code/scripts/serve.py --app test_server  # the PHP-facing wrapper
+    py Original_code/scripts/serve.py --threads 16
+
+The app module is imported once, so TensorFlow, FaceNet, dlib and the user
+gallery are loaded a single time and shared by every request thread. Worker
+threads only parse requests and match embeddings; every FaceNet call, from
+scans, registrations and gallery bootstraps alike, is funnelled into the one
+EMBED_SCHEDULER batching thread, so the model never runs concurrently and more
+threads means more requests per batch, not more copies of the model.
+
+On platforms with SIGHUP, ``kill -HUP <pid>`` reloads the gallery in the
+background (same as ``POST /gallery/reload`` from localhost); requests keep
+being answered from the old gallery until the new one is swapped in.
+"""
+import argparse
+import importlib
+import os
+import signal
+import sys
+import threading
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+DEFAULT_HOST = os.environ.get("TECHNEST_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("TECHNEST_PORT", "5001"))
+DEFAULT_THREADS = int(os.environ.get("TECHNEST_THREADS", "8"))
+
+
+def _reload_gallery_in_background():
+    server = sys.modules.get("server")
+    reload_gallery = getattr(server, "reload_gallery", None)
+    if reload_gallery is None:
+        print("[SERVE] Reload requested, but the app has no gallery to reload")
+        return
+
+    def _run():
+        try:
+            print(f"[SERVE] Gallery reloaded: {reload_gallery()} users")
+        except Exception as e:
+            print(f"[SERVE] Gallery reload failed: {e}")
+
+    threading.Thread(target=_run, name="gallery-reload", daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the TechNest recognition API with waitress")
+    parser.add_argument("--app", default="server", choices=("server", "test_server"),
+                        help="Flask module to serve (default: server)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help="request threads sharing the loaded models")
+    args = parser.parse_args(argv)
+
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[SERVE] waitress is not installed: pip install -r requirements.txt")
+        return 1
+
+    module = importlib.import_module(args.app)
+    # load models and the gallery before accepting connections, not on the first request
+    server = sys.modules.get("server")
+    if server is not None:
+        server.warm_up()
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: _reload_gallery_in_background())
+
+    print(f"[SERVE] {args.app} on http://{args.host}:{args.port} with {args.threads} threads")
+    serve(module.app, host=args.host, port=args.port, threads=args.threads)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,34 @@
 import base64
+import hmac
 import cv2
-import dlib
 import numpy as np
-import pickle
 import sys
 import os
 import time
 import json
+import threading
 import requests
-from keras_facenet import FaceNet
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
+from alignment import ALIGN_FACES, align_face, embedding_model_id
+from camera import CameraSession
+from camera_pipeline import RecognitionPipeline
+from gallery import Gallery, select_templates
+from image_ingest import data_url_bytes, decode_image, iter_frames, read_upload
+from face_detection import detect_faces, face_size_bounds, largest_face
+from face_tracker import IoUTracker
+from inference_scheduler import BatchScheduler
+from landmarks import FrameLandmarks
+from metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from embedding_codec import encode_embedding, to_text
+from embedding_store import EmbeddingStore, content_hash, photo_fingerprint, user_key
+from photo_fetcher import PhotoFetcher
+from user_directory import UserDirectory
 
 app = Flask(__name__)
+# Requests larger than this are rejected with 413 before they are read into memory
+MAX_UPLOAD_MB = float(os.environ.get("TECHNEST_MAX_UPLOAD_MB", "16"))
+app.config["MAX_CONTENT_LENGTH"] = int(MAX_UPLOAD_MB * 1024 * 1024)
 CORS(app, resources={r"/*/": {'origins': ['http://localhost:5173', 'http://localhost']}})
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) 
@@ -23,9 +39,37 @@ os.makedirs(DATASET_DIR, exist_ok=True)
 HAAR_PATH = os.path.join(os.path.dirname(BASE_DIR), "resources", "haar_face.xml")
 PREDICTOR_PATH = os.path.join(os.path.dirname(BASE_DIR), "shape_predictor", "shape_predictor_68_face_landmarks.dat")
 SAMPLES_REQUIRED = 7
+# Tracker votes only stand in for embeddings once a face has this many
+# independent embedding matches; login needs SAMPLES_REQUIRED votes on top
+LOGIN_MIN_MATCHES = 3
+# A tracked face is re-embedded this often; frames in between only add votes
+TRACK_REEMBED_SECONDS = 1.0
+# Spacing between enrollment samples of the tracked face
+SAMPLE_INTERVAL_SECONDS = 0.8
+
+# The webcam is opened and calibrated once and then shared by every scan. Set
+# TECHNEST_CAMERA_WARMUP=1 on a kiosk to open it at startup instead of on the
+# first scan.
+CAMERA_DEVICE = int(os.environ.get("TECHNEST_CAMERA_DEVICE", "0"))
+CAMERA_CALIBRATION_SECONDS = 2.0
+CAMERA_READY_TIMEOUT = 10.0
+CAMERA_WARMUP = os.environ.get("TECHNEST_CAMERA_WARMUP", "0") == "1"
+# Max crops per FaceNet forward pass during bulk enrollment
+EMBED_BATCH_SIZE = 32
+
+# Concurrent /recognize crops are coalesced into one FaceNet call: wait at most
+# this long for company, and stop adding crops once INFERENCE_MAX_BATCH are waiting
+# (a bulk batch of up to EMBED_BATCH_SIZE is never split)
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("TECHNEST_BATCH_WINDOW_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.environ.get("TECHNEST_MAX_BATCH", "16"))
 
 # PHP backend URL 
 PHP_API_URL = "http://localhost/api"
+# Admin routes (/users/delete, /gallery/reload) only accept localhost callers, or any
+# caller sending this value in the X-TechNest-Token header when it is set
+SERVICE_TOKEN = os.environ.get("TECHNEST_SERVICE_TOKEN", "")
+# How often the roster is polled for new/changed/deleted users (0 disables polling)
+USER_SYNC_INTERVAL = float(os.environ.get("TECHNEST_USER_SYNC_SECONDS", "5"))
 
 os.makedirs(DATASET_DIR, exist_ok=True)
 
@@ -33,79 +77,173 @@ os.makedirs(DATASET_DIR, exist_ok=True)
 FRONTEND_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), "embeddings", "uploads")
 os.makedirs(FRONTEND_UPLOAD_DIR, exist_ok=True)
 
-# Mapping the user data: { name: {"id": id, "role": role, "dept": dept, "embedding": np.array, "image_path": path} }
+# Mapping the user data: { name: {"id": id, "role": role, "dept": dept, "embedding": np.array,
+#                                 "templates": (T, 512) np.array, "image_path": path} }
 USERS_DATA = {}
 
+# Matrix view of USERS_DATA used for matching; rebuilt whenever USERS_DATA is reloaded
+GALLERY = Gallery()
+
+# On-disk embedding cache so startup only re-embeds users whose photos changed
+EMBEDDING_STORE = EmbeddingStore(model_id=embedding_model_id())
+
+# Connection-pooled, concurrent downloader shared by bootstrap and image_url requests
+PHOTO_FETCHER = PhotoFetcher(max_workers=8, per_host=4)
+
+# Local roster cache kept current by ETag polling; lookups never hit PHP
+USER_DIRECTORY = UserDirectory(PHP_API_URL, poll_interval=USER_SYNC_INTERVAL, timeout=10)
+_BOOTSTRAP_LOCK = threading.Lock()
+# Guards edits and swaps of USERS_DATA, GALLERY and _LIVE_ENROLLMENTS. It is only held
+# for in-memory updates, so registrations and deletions never wait on a bootstrap.
+_GALLERY_LOCK = threading.Lock()
+# While a bootstrap builds its new gallery, publish_user/unpublish_user also queue
+# their change here so it is replayed onto that gallery; None when none is running.
+_PENDING_UPDATES = None
+
+CAMERA = CameraSession(CAMERA_DEVICE, calibration_time=CAMERA_CALIBRATION_SECONDS)
+
+# Users (re-)enrolled through this process: name -> (published_at, user entry). Their
+# frame-averaged embedding wins over one rebuilt from photos, and it survives a roster
+# sync for LIVE_ENROLLMENT_GRACE seconds in case PHP has not listed the user yet.
+_LIVE_ENROLLMENTS = {}
+LIVE_ENROLLMENT_GRACE = 120
+
+# In-process timings and counters, served in Prometheus format at GET /metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    "technest_stage_seconds", "Time spent in each recognition pipeline stage", ("stage",))
+HTTP_REQUESTS = REGISTRY.counter(
+    "technest_http_requests_total", "HTTP requests served", ("endpoint", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram(
+    "technest_http_request_seconds", "HTTP request latency", ("endpoint",))
+BOOTSTRAP_SECONDS = REGISTRY.histogram(
+    "technest_bootstrap_seconds", "Gallery bootstrap duration",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+LAST_BOOTSTRAP_SECONDS = REGISTRY.gauge(
+    "technest_bootstrap_last_seconds", "Duration of the most recent gallery bootstrap")
+INFERENCE_BATCH_SIZE = REGISTRY.histogram(
+    "technest_inference_batch_size", "Face crops per FaceNet forward pass", buckets=BATCH_SIZE_BUCKETS)
+INFERENCE_BATCH_SECONDS = REGISTRY.histogram(
+    "technest_inference_batch_seconds", "FaceNet forward pass duration")
+REGISTRY.gauge("technest_gallery_users", "Users in the live gallery").set_function(lambda: len(GALLERY))
+
 
 # MODEL LOADING(for checking kay gaguba kis a mag load sakon)
-if not os.path.exists(HAAR_PATH):
-    raise FileNotFoundError(f"Haar cascade not found at {HAAR_PATH}")
+# Models are loaded on first use (or by warm_up()), so importing this module,
+# GET /test and test_server.py stay cheap. None means "not loaded yet".
+haar_cascade = None
+predictor = None
+embedder = None
+_MODEL_LOCK = threading.Lock()
+
+
+def get_haar_cascade():
+    global haar_cascade
+    if haar_cascade is None:
+        with _MODEL_LOCK:
+            if haar_cascade is None:
+                if not os.path.exists(HAAR_PATH):
+                    raise FileNotFoundError(f"Haar cascade not found at {HAAR_PATH}")
+                cascade = cv2.CascadeClassifier(HAAR_PATH)
+                if cascade.empty():
+                    raise RuntimeError(f"Failed to load Haar cascade from {HAAR_PATH}")
+                haar_cascade = cascade
+    return haar_cascade
+
+
+def get_predictor():
+    """dlib 68-landmark predictor, used for face alignment (only loaded when something asks for it)."""
+    global predictor
+    if predictor is None:
+        with _MODEL_LOCK:
+            if predictor is None:
+                import dlib
+                predictor = dlib.shape_predictor(PREDICTOR_PATH)  # type: ignore[attr-defined]
+    return predictor
+
+
+def get_embedder():
+    global embedder
+    if embedder is None:
+        with _MODEL_LOCK:
+            if embedder is None:
+                # TensorFlow is only imported here, the first time a face is embedded
+                from keras_facenet import FaceNet
+                started = time.time()
+                embedder = FaceNet()
+                print(f"[SYSTEM] FaceNet loaded in {time.time() - started:.1f}s")
+    return embedder
 
-haar_cascade = cv2.CascadeClassifier(HAAR_PATH)
-if haar_cascade.empty():
-    raise RuntimeError(f"Failed to load Haar cascade from {HAAR_PATH}")
 
-predictor = dlib.shape_predictor(PREDICTOR_PATH)  # type: ignore[attr-defined]
-    
 def scan_for_recognition(max_attempts=120, min_confirmations=2, threshold=0.85):
-    """Continuously scan for a recognizable face and return the best match."""
+    """Continuously scan for a recognizable face and return the best match.
+
+    Capture, detection and embedding run on separate threads (camera_pipeline.py)
+    so the camera is never blocked on TensorFlow; this thread only matches the
+    embeddings that come out and draws the window. Faces are tracked across
+    frames, so a track is embedded on entry and every TRACK_REEMBED_SECONDS,
+    and each frame it stays in view adds a vote for its identity. A match
+    needs ``min_confirmations`` votes, all of them from separate embeddings.
+    ``max_attempts`` counts analysed frames.
+    """
     window_name = "Attendance Recognition"
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        return {"status": "error", "message": "Unable to open camera"}
+    if not CAMERA.wait_ready(timeout=CAMERA_READY_TIMEOUT):
+        return {"status": "error", "message": CAMERA.error or "Camera is not ready"}
 
-    configure_camera(cap)
+    pipeline = RecognitionPipeline(CAMERA, detect_face, get_embedding,
+                                   IoUTracker(reembed_interval=TRACK_REEMBED_SECONDS,
+                                              min_matches=min_confirmations),
+                                   owns_grabber=False).start()
     matches = {}
     frames_processed = 0
+    overlay = None  # (box, label, color) from the newest analysed frame
 
     try:
         while frames_processed < max_attempts:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frames_processed += 1
-            display_frame = frame.copy()
-            box = detect_face(frame)
-
-            if box is not None:
-                x, y, w, h = box
-                cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                embedding = get_embedding(frame, box)
-                if embedding is not None:
-                    identity, dist = recognize_face(embedding, threshold=threshold)
+            result = pipeline.next_result(timeout=0.03)
+            if result is None:
+                break  # camera stopped delivering frames
+
+            if result:
+                _, _, box, track = result
+                frames_processed += 1
+                overlay = (box, None, None)
+
+                if track is not None:
+                    embedding = track.take_embedding()
+                    if embedding is not None:
+                        track.record(*recognize_face(embedding, threshold=threshold))
+                    else:
+                        track.confirm()
 
-                    if identity != "Unknown":
+                    identity = track.identity
+                    if identity is not None and identity != "Unknown":
                         match = matches.setdefault(identity, {"count": 0, "best_dist": float("inf")})
-                        match["count"] += 1
-                        if dist < match["best_dist"]:
-                            match["best_dist"] = dist
-
-                        cv2.putText(display_frame, f"Checking: {identity}", (x, y - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                        match["count"] = max(match["count"], track.votes)
+                        match["best_dist"] = min(match["best_dist"], track.best_dist)
+                        overlay = (box, f"Checking: {identity}", (0, 255, 0))
 
-                        if match["count"] >= min_confirmations:
-                            confidence = max(0.0, 1.0 - match["best_dist"])
+                        if track.matches >= min_confirmations:
+                            confidence = max(0.0, 1.0 - track.best_dist)
                             bring_window_to_front(window_name)
-                            cv2.imshow(window_name, display_frame)
+                            cv2.imshow(window_name, _draw_overlay(result[1].copy(), overlay))
                             cv2.waitKey(500)
                             return {
                                 "status": "success",
                                 "identity": identity,
-                                "distance": float(match["best_dist"]),
+                                "distance": float(track.best_dist),
                                 "confidence": float(confidence),
-                                "frames": frames_processed
+                                "frames": frames_processed,
+                                "embeddings": track.embeddings
                             }
                     else:
-                        cv2.putText(display_frame, "Analyzing face...", (x, y - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            else:
-                cv2.putText(display_frame, "No face detected", (20, 40),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                        overlay = (box, "Analyzing face...", (255, 255, 255))
 
+            # always show the live camera frame, annotated with the latest analysis
+            _, frame = pipeline.grabber.latest()
+            if frame is None:
+                continue
             bring_window_to_front(window_name)
-            cv2.imshow(window_name, display_frame)
+            cv2.imshow(window_name, _draw_overlay(frame.copy(), overlay))
             if cv2.waitKey(1) & 0xFF == 27:  
                 return {"status": "error", "message": "Recognition cancelled by user"}
 
@@ -127,11 +265,31 @@ def scan_for_recognition(max_attempts=120, min_confirmations=2, threshold=0.85):
             "frames": frames_processed
         }
     finally:
-        cap.release()
+        pipeline.stop()
         cv2.destroyWindow(window_name)
 
-embedder = FaceNet()
-print("[SYSTEM] Models loaded successfully.")
+
+def _draw_overlay(display_frame, overlay):
+    if overlay is None:
+        return display_frame
+    box, label, color = overlay
+    if box is None:
+        cv2.putText(display_frame, "No face detected", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        return display_frame
+    x, y, w, h = box
+    cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    if label:
+        cv2.putText(display_frame, label, (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    return display_frame
+
+EMBED_SCHEDULER = BatchScheduler(
+    lambda batch: get_embedder().embeddings(batch),
+    max_batch_size=INFERENCE_MAX_BATCH,
+    max_wait_ms=INFERENCE_BATCH_WINDOW_MS,
+    on_batch=lambda size, seconds: (INFERENCE_BATCH_SIZE.observe(size), INFERENCE_BATCH_SECONDS.observe(seconds)),
+)
 
 # Utilities
 def bring_window_to_front(winname):
@@ -139,35 +297,116 @@ def bring_window_to_front(winname):
     cv2.setWindowProperty(winname, cv2.WND_PROP_TOPMOST, 1)
 
 
-def configure_camera(cap, calibration_time=2.0):
-    """Stabilize the camera for a few seconds before actual capture."""
-    try:
-        cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
-    except Exception:
-        pass
-
-    start = time.time()
-    while time.time() - start < calibration_time:
-        ret, _ = cap.read()
-        if not ret:
-            break
-        cv2.waitKey(1)
-    return
+# Face width bounds (pixels) for enrollment photos, whose framing is unknown
+PHOTO_MIN_FACE = 60
+# Photos per user embedded as template candidates during bootstrap (largest faces first)
+MAX_PHOTOS_PER_USER = 10
+# Upper bound on faces recognized in one frame in multi-face mode
+MAX_FACES_PER_FRAME = 16
+
 
+def detect_face(frame, kiosk=True):
+    """Largest face in ``frame``, detected on a downscaled copy (see face_detection.py).
 
-def detect_face(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = haar_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(60, 60))
-    return max(faces, key=lambda b: b[2] * b[3]) if len(faces) > 0 else None
+    Frames from the server's own camera only search face sizes plausible at
+    the kiosk distance; uploaded and downloaded photos may be framed
+    arbitrarily and must pass ``kiosk=False``.
+    """
+    min_face, max_face = face_size_bounds(frame.shape[1]) if kiosk else (PHOTO_MIN_FACE, None)
+    cascade = get_haar_cascade()
+    with STAGE_SECONDS.labels("detect").time():
+        return largest_face(detect_faces(cascade, frame, min_face=min_face, max_face=max_face))
 
 
-def get_embedding(frame, box):
+def detect_all_faces(frame, kiosk=True, max_faces=MAX_FACES_PER_FRAME):
+    """Every face in ``frame`` as ``(x, y, w, h)`` tuples, largest first."""
+    min_face, max_face = face_size_bounds(frame.shape[1]) if kiosk else (PHOTO_MIN_FACE, None)
+    cascade = get_haar_cascade()
+    with STAGE_SECONDS.labels("detect").time():
+        boxes = detect_faces(cascade, frame, min_face=min_face, max_face=max_face)
+    return [tuple(int(v) for v in box) for box in boxes[:max_faces]]
+
+
+def recognize_faces(frame, threshold=0.8, kiosk=True):
+    """Recognize every face in ``frame``: one FaceNet batch, one identity per enrolled user.
+
+    Returns a list of ``{"box", "name", "distance"}`` dicts (``name`` is None for
+    faces that stay unknown), largest face first.
+    """
+    boxes, crops = [], []
+    landmarks = frame_landmarks(frame)  # one grayscale conversion for every face
+    for box in detect_all_faces(frame, kiosk=kiosk):
+        crop = crop_face(frame, box, landmarks)
+        if crop is not None:
+            boxes.append(box)
+            crops.append(crop)
+    if not crops:
+        return []
+
+    # all crops go to the scheduler together so they share a forward pass
+    with STAGE_SECONDS.labels("embed").time():
+        futures = [EMBED_SCHEDULER.submit(crop) for crop in crops]
+        embeddings = [future.result() for future in futures]
+    gallery = current_gallery()
+    with STAGE_SECONDS.labels("match").time():
+        matches = gallery.assign(embeddings, threshold)
+    return [{"box": box, "name": name, "distance": dist} for box, (name, dist) in zip(boxes, matches)]
+
+
+def frame_landmarks(frame, gray=None):
+    """Per-frame landmark cache used for alignment (see landmarks.py)."""
+    return FrameLandmarks(frame, _alignment_predictor(), gray=gray)
+
+
+_PREDICTOR_UNAVAILABLE = False
+
+
+def _alignment_predictor():
+    global _PREDICTOR_UNAVAILABLE
+    if not ALIGN_FACES or _PREDICTOR_UNAVAILABLE:
+        return None
+    try:
+        return get_predictor()
+    except Exception as e:
+        # faces are then framed from the Haar box alone, at the same eye positions
+        _PREDICTOR_UNAVAILABLE = True
+        print(f"[SYSTEM] Landmark predictor unavailable, aligning from face boxes: {e}")
+        return None
+
+
+def crop_face(frame, box, landmarks=None):
+    """160x160 FaceNet input for ``box``: eye-aligned with margin (alignment.py) unless TECHNEST_ALIGN_FACES=0."""
+    if ALIGN_FACES:
+        landmarks = landmarks if landmarks is not None else frame_landmarks(frame)
+        with STAGE_SECONDS.labels("align").time():
+            return align_face(frame, box, landmarks)
     x, y, w, h = box
     face_crop = frame[y:y+h, x:x+w]
     if face_crop.size == 0:
         return None
-    face_crop = cv2.resize(face_crop, (160, 160))
-    return embedder.embeddings([face_crop])[0]
+    return cv2.resize(face_crop, (160, 160))
+
+
+def get_embedding(frame, box):
+    face_crop = crop_face(frame, box)
+    if face_crop is None:
+        return None
+    # shares a forward pass with any other request embedding at the same moment
+    with STAGE_SECONDS.labels("embed").time():
+        return EMBED_SCHEDULER.embed(face_crop)
+
+
+def get_embeddings(crops, batch_size=EMBED_BATCH_SIZE):
+    """Embed many 160x160 face crops, one FaceNet forward pass per batch.
+
+    Batches go through EMBED_SCHEDULER like single crops, so the model is
+    only ever run from its one thread.
+    """
+    embeddings = []
+    for start in range(0, len(crops), batch_size):
+        with STAGE_SECONDS.labels("embed_batch").time():
+            embeddings.extend(EMBED_SCHEDULER.embed_batch(crops[start:start + batch_size]))
+    return embeddings
 
 # Database backend
 def send_to_php(name, embedding, user_id=None, role="Student", dept=None, username=None, password=None):
@@ -175,7 +414,7 @@ def send_to_php(name, embedding, user_id=None, role="Student", dept=None, userna
     try:
         data = {
             "name": name,
-            "embedding": pickle.dumps(embedding).hex(),  # serialize embedding
+            "embedding": to_text(encode_embedding(embedding, model_id=embedding_model_id())),  # versioned binary, see embedding_codec.py
             "id": user_id,
             "role": role,
             "dept": dept,
@@ -185,7 +424,8 @@ def send_to_php(name, embedding, user_id=None, role="Student", dept=None, userna
         # Drop any keys with None values to avoid sending "None" strings
         data = {k: v for k, v in data.items() if v is not None}
         # Send to API endpoint
-        response = requests.post(f"{PHP_API_URL}/save_user.php", data=data)
+        with STAGE_SECONDS.labels("php").time():
+            response = requests.post(f"{PHP_API_URL}/save_user.php", data=data)
         print(f"[PHP] Sent data to {PHP_API_URL}/save_user.php")
         return response.json()
     except Exception as e:
@@ -198,72 +438,171 @@ def sanitize_filename(name: str) -> str:
 
 
 def download_image(url: str, dest_path: str, timeout: int = 8) -> bool:
-    try:
-        resp = requests.get(url, timeout=timeout)
-        if resp.status_code == 200:
-            with open(dest_path, "wb") as f:
-                f.write(resp.content)
-            return True
-    except Exception as e:
-        print(f"[DOWNLOAD ERROR] Could not download {url}: {e}")
-    return False
+    with STAGE_SECONDS.labels("download").time():
+        content = PHOTO_FETCHER.fetch(url, timeout=timeout)
+    if content is None:
+        return False
+    with open(dest_path, "wb") as f:
+        f.write(content)
+    return True
 
 
-def best_image_for_user(image_urls: list) -> tuple:
-    """Download images, run face detection and pick the image with largest face area.
-    Returns (best_image_path, face_box) or (None, None).
-    """
-    best = (None, 0, None)
-    print(image_urls)
-    for idx, url in enumerate(image_urls or []):
-        if not url:
-            continue
+def _photo_url(url: str) -> str:
+    return f"http://localhost/{url.lstrip('/')}"
 
-        url = f"http://localhost/{url.lstrip('/')}"
-        
-        fname = os.path.basename(url.split("?")[0]) or f"img_{idx}.jpg"
-        
-        # ensure extension
-        if not os.path.splitext(fname)[1]:
-            fname += ".jpg"
-        
-        tmp_path = os.path.join(DATASET_DIR, fname)
-        
-        if not download_image(url, tmp_path):
-            print("Download image failed")
+
+def _photo_filename(url: str, idx: int = 0) -> str:
+    fname = os.path.basename(url.split("?")[0]) or f"img_{idx}.jpg"
+    # ensure extension
+    if not os.path.splitext(fname)[1]:
+        fname += ".jpg"
+    return fname
+
+
+def face_photos(downloads, limit=MAX_PHOTOS_PER_USER):
+    """Photos from ``[(url, content_or_None), ...]`` that contain a face, largest face first.
+    Returns up to ``limit`` ``(url, content, image, face_box)`` tuples.
+    """
+    found = []
+    for url, content in downloads:
+        if not content:
             continue
-        
-        img = cv2.imread(tmp_path)
-        
+        img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
         if img is None:
             continue
-        
-        box = detect_face(img)
-        
+        box = detect_face(img, kiosk=False)
         if box is None:
             continue
-        
-        _, _, w, h = box
-        area = w * h
-        
-        if area > best[1]:
-            best = (tmp_path, area, box)
+        found.append((url, content, img, box))
+    found.sort(key=lambda item: item[3][2] * item[3][3], reverse=True)
+    return found[:limit]
+
 
-    return (best[0], best[2]) if best[0] else (None, None)
+def pick_best_photo(downloads):
+    """From ``[(url, content_or_None), ...]`` pick the photo with the largest detected face.
+    Returns (url, content, image, face_box) or None.
+    """
+    photos = face_photos(downloads, limit=1)
+    return photos[0] if photos else None
 
 
-def bootstrap_users_from_php():
-    """Fetch users from PHP, download candidate images, compute embeddings and populate USERS_DATA."""
+def best_image_for_user(image_urls: list) -> tuple:
+    """Download images, run face detection and pick the image with largest face area.
+    Returns (best_image_path, face_box) or (None, None).
+    """
+    urls = [_photo_url(url) for url in image_urls or [] if url]
+    best = None
+    for _, downloads in PHOTO_FETCHER.fetch_groups([(0, urls)]):
+        best = pick_best_photo(downloads)
+    if best is None:
+        return (None, None)
+
+    url, content, _, box = best
+    tmp_path = os.path.join(DATASET_DIR, _photo_filename(url))
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    return (tmp_path, box)
+
+
+def _cached_user(entry, user):
+    # refresh metadata from PHP in case role/dept/name changed without new photos
+    return {
+        **entry["info"],
+        "id": user.get("id") or user.get("user_id"),
+        "role": user.get("role"),
+        "dept": user.get("dept"),
+        "embedding": entry["templates"][0],
+        "templates": entry["templates"],
+    }
+
+
+def bootstrap_users_from_php(refresh=True):
+    """Fetch users from PHP, download candidate images, compute embeddings and populate USERS_DATA.
+
+    Embeddings are cached in EMBEDDING_STORE; users whose photo list is unchanged are
+    served from the cache without downloading or re-embedding anything. With
+    ``refresh=False`` the roster already held by USER_DIRECTORY is used as-is.
+    """
+    global _PENDING_UPDATES
+    with _BOOTSTRAP_LOCK:
+        with _GALLERY_LOCK:
+            _PENDING_UPDATES = []
+        started = time.perf_counter()
+        try:
+            _bootstrap_users(refresh)
+        finally:
+            _apply_pending_deletions()
+            elapsed = time.perf_counter() - started
+            BOOTSTRAP_SECONDS.observe(elapsed)
+            LAST_BOOTSTRAP_SECONDS.set(elapsed)
+
+
+def _matching_names(users, user_id=None, name=None):
+    return [n for n, info in users.items()
+            if (name and n == name) or (user_id and str(info.get("id")) == str(user_id))]
+
+
+def _install_gallery(users):
+    """Make ``users`` the live USERS_DATA/GALLERY, replaying publishes and deletions made meanwhile."""
+    global GALLERY
+    gallery = Gallery.from_users(users)
+    with _GALLERY_LOCK:
+        for update in _PENDING_UPDATES or ():
+            if update[0] == "publish":
+                _, name, entry = update
+                users[name] = entry
+                gallery.add(name, entry["templates"], entry)
+            else:
+                _, user_id, name, _ = update
+                for n in _matching_names(users, user_id, name):
+                    users.pop(n, None)
+                    gallery.remove(n)
+        USERS_DATA.clear()
+        USERS_DATA.update(users)
+        GALLERY = gallery
+
+
+def _forget_embeddings(user_id, names):
+    if user_id:
+        EMBEDDING_STORE.remove(user_key({"id": user_id}))
+    for n in names:
+        EMBEDDING_STORE.remove(user_key({"name": n}))
+
+
+def _apply_pending_deletions():
+    """End of a bootstrap: drop cache entries of users deleted while it ran, then stop queueing."""
+    global _PENDING_UPDATES
+    with _GALLERY_LOCK:
+        deletions = [update for update in _PENDING_UPDATES or () if update[0] == "delete"]
+        _PENDING_UPDATES = None
+        for _, user_id, _, names in deletions:
+            _forget_embeddings(user_id, names)
+        if deletions:
+            EMBEDDING_STORE.save()
+
+
+def _bootstrap_users(refresh):
+    started = time.time()
+
+    # Serve from the on-disk cache straight away, before touching the network
+    if not USERS_DATA and EMBEDDING_STORE.load():
+        _install_gallery(EMBEDDING_STORE.users_data())
+        print(f"[BOOTSTRAP] Loaded {len(GALLERY)} cached embeddings in {time.time() - started:.3f}s")
+
     print("[BOOTSTRAP] Fetching users from PHP to build recognition dataset...")
     try:
-        response = requests.get(f"{PHP_API_URL}/get-state", timeout=10)
-        if not response.ok:
-            print(f"[BOOTSTRAP] PHP fetch failed: {response.status_code}")
+        if refresh and USER_DIRECTORY.sync() is None and not USER_DIRECTORY.loaded:
+            print("[BOOTSTRAP] PHP fetch failed, keeping cached users")
             return
 
-        payload = response.json()
-        users = payload.get("users", []) if isinstance(payload, dict) else []
+        users = USER_DIRECTORY.users()
 
+        fresh = {}
+        seen_keys = set()
+        reused = 0
+        changed = {}  # key -> (user, name, fingerprint, photo urls) for users that need re-embedding
+        staged = {}   # key -> (name, info, fingerprint, embeddings, photo hashes) for changed users
+        pending = []  # (key, slot, crop) awaiting one batched embed
         for user in users:
             name = user.get("name")
             
@@ -272,94 +611,167 @@ def bootstrap_users_from_php():
             
             # decode json string
             image_urls = json.loads(user.get("photo")) if isinstance(user.get("photo"), str) else []
-            
-            sanitized = sanitize_filename(name)
-            user_dir = os.path.join(FRONTEND_UPLOAD_DIR, sanitized)
-            os.makedirs(user_dir, exist_ok=True)
 
-            best_path, box = best_image_for_user(image_urls)
+            key = user_key(user)
+            fingerprint = photo_fingerprint(image_urls)
+            seen_keys.add(key)
+
+            cached = EMBEDDING_STORE.get(key, fingerprint)
+            if cached is not None:
+                fresh[name] = _cached_user(cached, user)
+                reused += 1
+                continue
+            
+            changed[key] = (user, name, fingerprint, [_photo_url(url) for url in image_urls if url])
+
+        # photos of every changed user download concurrently; each user's photos are
+        # decoded and run through detection while the remaining downloads are in flight
+        groups = [(key, item[3]) for key, item in changed.items()]
+        for key, downloads in PHOTO_FETCHER.fetch_groups(groups):
+            user, name, fingerprint, _ = changed[key]
+            photos = face_photos(downloads)
             
-            if not best_path:
+            if not photos:
                 print(f"[BOOTSTRAP] No valid image for user {name}")
+                EMBEDDING_STORE.remove(key)
                 continue
 
-            # move best image into user's folder
-            dest = os.path.join(user_dir, os.path.basename(best_path))
-            try:
-                os.replace(best_path, dest)
-            except Exception:
-                try:
-                    os.rename(best_path, dest)
-                except Exception:
-                    # fallback to copy
-                    with open(best_path, "rb") as r, open(dest, "wb") as w:
-                        w.write(r.read())
-
-            # compute embedding
-            img = cv2.imread(dest)
-            if img is None:
-                print(f"[BOOTSTRAP] Failed to read downloaded image for {name}")
-                continue
-            if box is None:
-                box = detect_face(img)
-            if box is None:
-                print(f"[BOOTSTRAP] No face detected after move for {name}")
-                continue
-            emb = get_embedding(img, box)
-            if emb is None:
-                print(f"[BOOTSTRAP] Failed to compute embedding for {name}")
-                continue
+            # keep the best image in the user's folder
+            url, content, _, _ = photos[0]
+            sanitized = sanitize_filename(name)
+            user_dir = os.path.join(FRONTEND_UPLOAD_DIR, sanitized)
+            os.makedirs(user_dir, exist_ok=True)
+            dest = os.path.join(user_dir, _photo_filename(url))
+            with open(dest, "wb") as f:
+                f.write(content)
 
-            USERS_DATA[name] = {
+            info = {
                 "id": user.get("id") or user.get("user_id"),
                 "role": user.get("role"),
                 "dept": user.get("dept"),
-                "embedding": emb,
                 "image_path": dest,
             }
-            print(f"[BOOTSTRAP] Loaded user {name} (id={USERS_DATA[name]['id']})")
+
+            # every photo with a face is a template candidate
+            embeddings, hashes = [], []
+            for _, content, img, box in photos:
+                # same image bytes under a new URL: reuse the embedding we already have
+                photo_hash = content_hash(content)
+                emb = EMBEDDING_STORE.find_by_photo_hash(photo_hash)
+                if emb is None:
+                    crop = crop_face(img, box)
+                    if crop is None:
+                        continue
+                    pending.append((key, len(embeddings), crop))
+                embeddings.append(emb)
+                hashes.append(photo_hash)
+            staged[key] = (name, info, fingerprint, embeddings, hashes)
+
+        # embed every changed user's photos together instead of one forward pass each
+        for (key, slot, _), emb in zip(pending, get_embeddings([item[-1] for item in pending])):
+            staged[key][3][slot] = emb
+
+        for key, (name, info, fingerprint, embeddings, hashes) in staged.items():
+            if not embeddings:
+                print(f"[BOOTSTRAP] Failed to compute embedding for {name}")
+                continue
+            templates, chosen = select_templates(embeddings)
+            EMBEDDING_STORE.put(key, name, templates, info=info, fingerprint=fingerprint,
+                                photo_hashes=[hashes[i] for i in chosen])
+            fresh[name] = {**info, "embedding": templates[0], "templates": templates}
+            print(f"[BOOTSTRAP] Loaded user {name} (id={info['id']}, {len(templates)} templates)")
+
+        roster_names = {user.get("name") for user in users}
+        with _GALLERY_LOCK:
+            for name, (published_at, entry) in list(_LIVE_ENROLLMENTS.items()):
+                if name in roster_names and name in fresh:
+                    fresh[name] = {**fresh[name], "embedding": entry["embedding"], "templates": entry["templates"]}
+                elif time.time() - published_at < LIVE_ENROLLMENT_GRACE:
+                    fresh[name] = entry
+                else:
+                    # deleted in PHP (or never saved there)
+                    _LIVE_ENROLLMENTS.pop(name, None)
+
+        removed = EMBEDDING_STORE.prune(seen_keys)
+        EMBEDDING_STORE.save()
+
+        _install_gallery(fresh)
+        print(f"[BOOTSTRAP] {reused} users from cache, {len(fresh) - reused} re-embedded, {len(removed)} removed")
 
     except Exception as e:
         print(f"[BOOTSTRAP ERROR] {e}")
 
+    finally:
+        print(f"[BOOTSTRAP] Gallery ready with {len(GALLERY)} users in {time.time() - started:.2f}s")
+
+
+_GALLERY_READY = threading.Event()
+_GALLERY_START_LOCK = threading.Lock()
+
+
+def ensure_gallery():
+    """Bootstrap the gallery and start roster polling the first time it is needed.
+
+    Concurrent first callers wait for that bootstrap instead of matching
+    against an empty gallery.
+    """
+    if _GALLERY_READY.is_set():
+        return
+    with _GALLERY_START_LOCK:
+        if _GALLERY_READY.is_set():
+            return
+        bootstrap_users_from_php()
+        # then pick up registrations, edits and deletions made through PHP while we run
+        USER_DIRECTORY.start(on_change=lambda result: bootstrap_users_from_php(refresh=False))
+        _GALLERY_READY.set()
+
 
-# Run bootstrap on import/startup
-bootstrap_users_from_php()
+def current_gallery():
+    ensure_gallery()
+    return GALLERY
+
+
+def warm_up(gallery=True, camera=CAMERA_WARMUP, landmarks=ALIGN_FACES):
+    """Load models and the gallery up front so the first request is not slow.
+
+    Called when server.py is run directly and by serve.py; a plain import
+    loads nothing and every piece is loaded on first use instead.
+    """
+    started = time.time()
+    get_haar_cascade()
+    get_embedder()
+    if landmarks:
+        _alignment_predictor()
+    print(f"[SYSTEM] Models loaded successfully in {time.time() - started:.1f}s")
+    if gallery:
+        ensure_gallery()
+    if camera:
+        CAMERA.open()  # calibrates in the background while the server starts
 
 # FACIAL RECOGNITION CORE
 def decode_image_from_data_url(data_url: str):
-    if not data_url:
-        return None
-    try:
-        if data_url.startswith('data:'):
-            _, encoded = data_url.split(',', 1)
-        else:
-            encoded = data_url
-        img_bytes = base64.b64decode(encoded)
-    except (ValueError, TypeError):
-        return None
-
-    np_buffer = np.frombuffer(img_bytes, dtype=np.uint8)
-    if np_buffer.size == 0:
-        return None
-    return cv2.imdecode(np_buffer, cv2.IMREAD_COLOR)
+    with STAGE_SECONDS.labels("decode").time():
+        img, _ = decode_image(data_url_bytes(data_url))
+    return img
 
 
 def embeddings_from_frames(frames):
-    embeddings = []
-    for frame_data in frames or []:
-        frame = decode_image_from_data_url(frame_data)
-        if frame is None:
-            continue
-        box = detect_face(frame)
+    """Decode and detect frames one by one, keeping only face crops, then embed them in one pass.
+
+    Frames may be data URLs, raw bytes or uploaded files; each is decoded at
+    reduced resolution and released before the next one (see image_ingest.py).
+    """
+    crops = []
+    for frame in iter_frames(frames if isinstance(frames, list) else list(frames or [])):
+        box = detect_face(frame, kiosk=False)
         if box is None:
             continue
-        emb = get_embedding(frame, box)
-        if emb is not None:
-            embeddings.append(emb)
-        if len(embeddings) >= SAMPLES_REQUIRED:
+        crop = crop_face(frame, box)
+        if crop is not None:
+            crops.append(crop)
+        if len(crops) >= SAMPLES_REQUIRED:
             break
-    return embeddings
+    return get_embeddings(crops)
 
 
 def save_frames_to_user_folder(name: str, frames: list) -> list:
@@ -409,36 +821,38 @@ def save_frames_to_user_folder(name: str, frames: list) -> list:
 
 
 def _capture_samples(samples_required=SAMPLES_REQUIRED, window_name="Face Capture"):
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        return {"status": "error", "message": "Unable to open camera"}
+    if not CAMERA.wait_ready(timeout=CAMERA_READY_TIMEOUT):
+        return {"status": "error", "message": CAMERA.error or "Camera is not ready"}
 
-    configure_camera(cap)
+    seq = 0
+    # one sample per SAMPLE_INTERVAL_SECONDS of the tracked face; the preview
+    # keeps running in between instead of sleeping
+    tracker = IoUTracker(reembed_interval=SAMPLE_INTERVAL_SECONDS)
     samples = []
     count = 0
     while count < samples_required:
-        ret, frame = cap.read()
-        if not ret:
+        seq, frame = CAMERA.read(after_seq=seq)
+        if frame is None:
             break
+        frame = frame.copy()  # the session's frame is shared; draw on our own copy
         box = detect_face(frame)
         if box is not None:
-            emb = get_embedding(frame, box)
-            if emb is not None:
-                samples.append(emb)
-                count += 1
-                x, y, w, h = box
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, f"Captured {count}/{samples_required}", (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                bring_window_to_front(window_name)
-                cv2.imshow(window_name, frame)
-                cv2.waitKey(1)
-                time.sleep(0.8)
+            track = tracker.update([box])[0]
+            x, y, w, h = box
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            if tracker.needs_embedding(track):
+                emb = get_embedding(frame, box)
+                track.set_embedding(emb)
+                if emb is not None:
+                    samples.append(emb)
+                    count += 1
+            cv2.putText(frame, f"Captured {count}/{samples_required}", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         else:
-            cv2.imshow(window_name, frame)
-            bring_window_to_front(window_name)
-            cv2.waitKey(1)
-    cap.release()
+            tracker.update([])
+        cv2.imshow(window_name, frame)
+        bring_window_to_front(window_name)
+        cv2.waitKey(1)
     cv2.destroyAllWindows()
     return {"status": "ok", "samples": samples}
 
@@ -463,7 +877,9 @@ def register_user(name, user_id=None, role="Student", dept=None, username=None,
     if len(samples) == 0:
         return {"status": "error", "message": "No usable samples supplied for registration."}
 
+    # PHP keeps one averaged embedding; the live gallery keeps diverse templates
     avg_emb = np.mean(np.array(samples), axis=0)
+    templates, _ = select_templates(samples)
 
     print("[REGISTER] Sending data to PHP API")
     response = send_to_php(
@@ -487,6 +903,9 @@ def register_user(name, user_id=None, role="Student", dept=None, username=None,
             "php_response": response
         }
 
+    php_id = response.get("user_id") or response.get("id")
+    publish_user(name, templates, {"id": user_id or php_id, "role": role, "dept": dept})
+
     return {
         "status": "success",
         "message": f"User {name} registered successfully",
@@ -495,14 +914,52 @@ def register_user(name, user_id=None, role="Student", dept=None, username=None,
     }
 
 
+def publish_user(name, templates, info):
+    """Make a newly (re-)enrolled user recognizable right away, without a restart.
+
+    ``templates`` is one embedding or a ``(T, dim)`` stack. The live GALLERY is
+    updated copy-on-write, so /recognize requests that are already matching
+    keep using their snapshot and never wait on this. A bootstrap running
+    meanwhile replays the change onto the gallery it is building.
+    """
+    templates = np.asarray(templates, dtype=np.float32)
+    templates = templates.reshape(-1, templates.shape[-1])
+    entry = {**info, "embedding": templates[0], "templates": templates}
+    with _GALLERY_LOCK:
+        _LIVE_ENROLLMENTS[name] = (time.time(), entry)
+        USERS_DATA[name] = entry
+        GALLERY.add(name, templates, info)
+        if _PENDING_UPDATES is not None:
+            _PENDING_UPDATES.append(("publish", name, entry))
+    print(f"[REGISTER] {name} is now live in the gallery ({len(GALLERY)} users)")
+
+
+def unpublish_user(user_id=None, name=None):
+    """Remove a deleted user from the live gallery and the embedding cache. Returns removed names.
+
+    While a bootstrap runs it owns the embedding cache, so the cache entries
+    are dropped when it finishes instead.
+    """
+    with _GALLERY_LOCK:
+        names = _matching_names(USERS_DATA, user_id, name)
+        for n in names:
+            GALLERY.remove(n)
+            USERS_DATA.pop(n, None)
+            _LIVE_ENROLLMENTS.pop(n, None)
+        if _PENDING_UPDATES is not None:
+            _PENDING_UPDATES.append(("delete", user_id, name, names))
+        else:
+            _forget_embeddings(user_id, names)
+            EMBEDDING_STORE.save()
+    return names
+
+
 def recognize_face(embedding, threshold=0.8):
-    min_dist, identity = float("inf"), "Unknown"
-    for name, db_emb in USERS_DATA:
-        dist = np.linalg.norm(embedding - db_emb)
-        if dist < min_dist:
-            min_dist, identity = dist, name
+    gallery = current_gallery()
+    with STAGE_SECONDS.labels("match").time():
+        identity, min_dist = gallery.best_match(embedding)
     
-    is_recognized = min_dist < threshold
+    is_recognized = identity is not None and min_dist < threshold
     result = (identity, min_dist) if is_recognized else ("Unknown", min_dist)
     
     return result
@@ -513,7 +970,7 @@ def recognize_from_frame_data(frame_data, threshold=0.8):
     if frame is None:
         return {"status": "error", "message": "Invalid or empty frame data provided."}
 
-    box = detect_face(frame)
+    box = detect_face(frame, kiosk=False)
     if box is None:
         return {
             "status": "unrecognized",
@@ -548,38 +1005,44 @@ def recognize_from_frame_data(frame_data, threshold=0.8):
 
 
 def login_user(name):
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        return {"status": "error", "message": "Unable to open camera"}
-
-    configure_camera(cap)
-    count = 0
-    while count < SAMPLES_REQUIRED:
-        ret, frame = cap.read()
-        if not ret:
+    if not CAMERA.wait_ready(timeout=CAMERA_READY_TIMEOUT):
+        return {"status": "error", "message": CAMERA.error or "Camera is not ready"}
+
+    seq = 0
+    # the face is re-embedded until LOGIN_MIN_MATCHES embeddings agree; only then
+    # do frames of the same track count as votes without their own embedding
+    tracker = IoUTracker(reembed_interval=TRACK_REEMBED_SECONDS, min_matches=LOGIN_MIN_MATCHES)
+    count = matches = 0
+    while count < SAMPLES_REQUIRED or matches < LOGIN_MIN_MATCHES:
+        seq, frame = CAMERA.read(after_seq=seq)
+        if frame is None:
             break
+        frame = frame.copy()  # the session's frame is shared; draw on our own copy
         box = detect_face(frame)
         if box is not None:
-            emb = get_embedding(frame, box)
-            if emb is not None:
-                identity, dist = recognize_face(emb)
-                if identity == name:
-                    count += 1
-                    x, y, w, h = box
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(frame, f"Match {count}/{SAMPLES_REQUIRED}", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    bring_window_to_front("Login")
-                    cv2.imshow("Login", frame)
-                    cv2.waitKey(1)
-                    time.sleep(1)
+            track = tracker.update([box])[0]
+            if tracker.needs_embedding(track):
+                emb = get_embedding(frame, box)
+                track.set_embedding(emb)
+                if emb is not None:
+                    track.record(*recognize_face(emb))
+            else:
+                track.confirm()
+            count = track.votes if track.identity == name else 0
+            matches = track.matches if track.identity == name else 0
+            if count:
+                x, y, w, h = box
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, f"Match {min(count, SAMPLES_REQUIRED)}/{SAMPLES_REQUIRED}", (x, y - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         else:
-            cv2.imshow("Login", frame)
-            bring_window_to_front("Login")
-            cv2.waitKey(1)
-    cap.release()
+            tracker.update([])
+        cv2.imshow("Login", frame)
+        bring_window_to_front("Login")
+        cv2.waitKey(1)
     cv2.destroyAllWindows()
-    return {"status": "success" if count >= SAMPLES_REQUIRED else "error", "matches": count}
+    confirmed = count >= SAMPLES_REQUIRED and matches >= LOGIN_MIN_MATCHES
+    return {"status": "success" if confirmed else "error", "matches": count, "embeddings": matches}
 
 
 def reenroll_user(name, user_id=None, role="Student", dept=None, username=None, password=None, frames=None):
@@ -622,8 +1085,13 @@ def register_route():
             return jsonify({"status": "error", "message": "Name is required"}), 400
             
         print(f"[REGISTER] Starting facial recognition for {name}")
-        # If frontend provided an image_url (or image), download into user folder and convert to data-url
-        frames = payload.get("frames") or []
+        # frames arrive as multipart file parts (read as they are consumed) or as data URLs
+        # in the form/JSON body, which is parsed whole before the first frame is decoded
+        frames = request.files.getlist("frames") or payload.get("frames") or []
+        if isinstance(frames, str):
+            frames = [frames]
+        frames = list(frames)
+        # If frontend provided an image_url (or image), download into user folder and use its bytes
         single_image_url = payload.get("image_url") or payload.get("image")
         if single_image_url:
             sanitized = sanitize_filename(name)
@@ -632,11 +1100,8 @@ def register_route():
             fname = os.path.basename(single_image_url.split("?")[0]) or "upload.jpg"
             dest_path = os.path.join(user_dir, fname)
             if download_image(single_image_url, dest_path):
-                # convert saved file to data-url for register_user
                 with open(dest_path, "rb") as f:
-                    b = f.read()
-                data_url = "data:image/jpeg;base64," + base64.b64encode(b).decode("ascii")
-                frames = [data_url]
+                    frames = [f.read()]
 
         # Capture face and register user
         result = register_user(
@@ -696,7 +1161,7 @@ def login_route():
             img = cv2.imread(incoming_path)
             if img is None:
                 return jsonify({"status": "error", "message": "Downloaded image unreadable"}), 400
-            box = detect_face(img)
+            box = detect_face(img, kiosk=False)
             if box is None:
                 try:
                     os.remove(incoming_path)
@@ -711,19 +1176,14 @@ def login_route():
                     pass
                 return jsonify({"status": "error", "message": "Failed to extract features"}), 500
 
-            best_match = (None, float("inf"))
-            for uname, info in USERS_DATA.items():
-                db_emb = info.get("embedding")
-                if db_emb is None:
-                    continue
-                dist = float(np.linalg.norm(emb - db_emb))
-                if dist < best_match[1]:
-                    best_match = (uname, dist)
+            gallery = current_gallery()
+            with STAGE_SECONDS.labels("match").time():
+                best_match = gallery.best_match(emb)
 
             THRESHOLD = 0.6
             if best_match[0] and best_match[1] < THRESHOLD:
                 uname = best_match[0]
-                info = USERS_DATA[uname]
+                info = gallery.get_info(uname)
                 # move image to user folder
                 user_folder = os.path.join(FRONTEND_UPLOAD_DIR, sanitize_filename(uname))
                 os.makedirs(user_folder, exist_ok=True)
@@ -791,8 +1251,6 @@ def reenroll_route():
 @app.route("/recognize", methods=["POST"])
 def recognize_route():
     try:
-        image_uri = request.data
-        
         # if not image_url:
         #     # fallback to camera-based scanning
         #     scan_result = scan_for_recognition()
@@ -820,19 +1278,49 @@ def recognize_route():
         # if not download_image(image_url, incoming_path):
         #     return jsonify({"status": "error", "message": "Failed to download image"}), 400
 
-        file = (request.files['image'])
+        file = request.files.get('image')
         
         if file is None:
             return jsonify({"status": "error", "message": "No image parameter passed to route"}), 400
         
-        filestr = file.read()
-        npimg = np.frombuffer(filestr, dtype=np.uint8)
-        img = cv2.imdecode(npimg, flags=cv2.IMREAD_COLOR)
+        # decoded straight at reduced size; boxes are scaled back by ``factor``
+        with STAGE_SECONDS.labels("decode").time():
+            img, factor = decode_image(read_upload(file))
         
         if img is None:
             return jsonify({"status": "error", "message": "Image unreadable"}), 400
 
-        box = detect_face(img)
+        # threshold for acceptance
+        THRESHOLD = 0.8
+
+        multi = (request.args.get("multi") or request.form.get("multi") or "").lower()
+        if multi in ("1", "true", "yes"):
+            # group check-in: every face in the frame, each user matched at most once
+            gallery = current_gallery()
+            faces = []
+            for face in recognize_faces(img, threshold=THRESHOLD, kiosk=False):
+                info = gallery.get_info(face["name"]) if face["name"] else {}
+                x, y, w, h = (v * factor for v in face["box"])
+                faces.append({
+                    "box": {"x": x, "y": y, "w": w, "h": h},
+                    "recognized": face["name"] is not None,
+                    "name": face["name"],
+                    "id": info.get("id"),
+                    "role": info.get("role"),
+                    "dept": info.get("dept"),
+                    "confidence": float(max(0.0, 1.0 - face["distance"])),
+                    "distance": float(face["distance"]) if np.isfinite(face["distance"]) else None,
+                })
+            if not faces:
+                return jsonify({"status": "unrecognized", "message": "No face detected", "faces": []}), 400
+            recognized = sum(face["recognized"] for face in faces)
+            return jsonify({
+                "status": "success" if recognized else "forbidden",
+                "recognized": recognized,
+                "faces": faces,
+            })
+
+        box = detect_face(img, kiosk=False)
         if box is None:
             # try:
             #     os.remove(incoming_path)
@@ -848,25 +1336,16 @@ def recognize_route():
             #     pass
             return jsonify({"status": "error", "message": "Failed to extract features"}), 500
 
-        # compare against USERS_DATA
-        best_match = (None, float("inf"))
-        
-        for name, info in USERS_DATA.items():
-            db_emb = info.get("embedding")
-            if db_emb is None:
-                continue
-            dist = float(np.linalg.norm(emb - db_emb))
-            if dist < best_match[1]:
-                best_match = (name, dist)
+        # compare against every enrolled user in one batched computation
+        gallery = current_gallery()
+        with STAGE_SECONDS.labels("match").time():
+            best_match = gallery.best_match(emb)
 
         # print(best_match)
 
-        # threshold for acceptance
-        THRESHOLD = 0.8
-        
         if best_match[0] and best_match[1] < THRESHOLD:
             name = best_match[0]
-            info = USERS_DATA[name]
+            info = gallery.get_info(name)
             
             # move incoming image into user's folder
             # user_folder = os.path.join(FRONTEND_UPLOAD_DIR, sanitize_filename(name))
@@ -900,6 +1379,82 @@ def recognize_route():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def _admin_allowed():
+    """Admin routes accept localhost callers, or the X-TechNest-Token header when SERVICE_TOKEN is set."""
+    if SERVICE_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-TechNest-Token", ""), SERVICE_TOKEN)
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route("/users/delete", methods=["POST"])
+def delete_user_route():
+    """Called by src/api/delete-user.php so a deleted user stops matching immediately."""
+    if not _admin_allowed():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    try:
+        payload = request.form if request.form else (request.get_json(silent=True) or {})
+        user_id = payload.get("id") or payload.get("user_id")
+        name = payload.get("name")
+        if not user_id and not name:
+            return jsonify({"status": "error", "message": "id or name is required"}), 400
+
+        removed = unpublish_user(user_id=user_id, name=name)
+        print(f"[DELETE] Removed {removed or 'nobody'} from the gallery")
+        return jsonify({"status": "success", "removed": removed, "users": len(GALLERY)})
+    except Exception as e:
+        print(f"[ERROR] Delete error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+def reload_gallery():
+    """Re-sync the roster and rebuild the gallery; requests keep matching against the old one meanwhile."""
+    if _GALLERY_READY.is_set():
+        bootstrap_users_from_php(refresh=True)
+    else:
+        ensure_gallery()
+    return len(GALLERY)
+
+
+@app.route("/gallery/reload", methods=["POST"])
+def reload_gallery_route():
+    """Admin hook for serve.py deployments (the same as sending SIGHUP)."""
+    if not _admin_allowed():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    return jsonify({"status": "success", "users": reload_gallery()})
+
+
+@app.errorhandler(413)
+def upload_too_large(_):
+    return jsonify({"status": "error", "message": f"Upload exceeds {MAX_UPLOAD_MB:g} MB"}), 413
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    started = getattr(g, "request_started", None)
+    endpoint = request.endpoint or "unmatched"
+    if started is not None:
+        HTTP_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    """Prometheus scrape endpoint; reading it never loads models."""
+    return app.response_class(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route("/camera/status", methods=["GET"])
+def camera_status():
+    status = CAMERA.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
 @app.route("/test", methods=["GET"])
 def test_connection():
     return jsonify({
@@ -910,8 +1465,12 @@ def test_connection():
             "haar_cascade": haar_cascade is not None,
             "predictor": predictor is not None,
             "embedder": embedder is not None
-        }
+        },
+        "gallery_loaded": _GALLERY_READY.is_set()
     })
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    warm_up()
+    # development server; use serve.py in production. The reloader would import
+    # this module (TensorFlow, bootstrap) a second time, so it stays off.
+    app.run(host="0.0.0.0", port=5001, debug=os.environ.get("TECHNEST_DEBUG", "0") == "1", use_reloader=False)
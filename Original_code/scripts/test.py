@@ -1,13 +1,13 @@
 import cv2
 import dlib
 import numpy as np
-import pickle
 import os
 import time
 import base64
 import requests
 from keras_facenet import FaceNet
 from flask import Flask, request, jsonify
+from embedding_codec import decode_embedding, encode_embedding, from_text, to_text
 
 app = Flask(__name__)
 
@@ -61,7 +61,7 @@ def send_to_php(name, embedding):
     try:
         data = {
             "name": name,
-            "embedding": pickle.dumps(embedding).hex()
+            "embedding": to_text(encode_embedding(embedding))
         }
         response = requests.post(f"{PHP_API_URL}/save_user.php", data=data)
         return response.json()
@@ -77,8 +77,13 @@ def fetch_from_php():
         if response.status_code == 200:
             users_data = response.json()
             users = []
-            for name, emb_hex in users_data.items():
-                emb = pickle.loads(bytes.fromhex(emb_hex))
+            for name, emb_text in users_data.items():
+                try:
+                    emb = decode_embedding(from_text(emb_text))
+                except ValueError as e:
+                    # old hex-pickled rows are never unpickled; re-register those users
+                    print(f"[PHP ERROR] Skipping embedding for {name}: {e}")
+                    continue
                 users.append((name, emb))
             return users
         else:
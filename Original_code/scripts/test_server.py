@@ -1,9 +1,9 @@
 import os
 import sys
+import threading
 import time
 from typing import Any, Dict, List, Optional
 
-import requests
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
@@ -19,14 +19,19 @@ SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
 if SCRIPTS_DIR not in sys.path:
     sys.path.append(SCRIPTS_DIR)
 
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+
 try:
     from server import ( 
         PHP_API_URL,
+        ensure_gallery,
         login_user as py_login_user,
         recognize_from_frame_data,
         register_user as py_register_user,
         reenroll_user as py_reenroll_user,
         scan_for_recognition,
+        USER_DIRECTORY,
+        warm_up,
     )
 
     FACIAL_RECOGNITION_AVAILABLE = True
@@ -36,12 +41,19 @@ except Exception as exc:
     PHP_API_URL = "http://localhost/api"
     print(f"[ERROR] Could not import facial recognition stack: {exc}")
 
+    from user_directory import UserDirectory
+
+    # synced on the first lookup (see _ensure_roster), so importing never waits on PHP
+    USER_DIRECTORY = UserDirectory(PHP_API_URL)
+
 app = Flask(__name__)
 CORS(app)
 
 def _ensure_stack_ready() -> None:
     if not FACIAL_RECOGNITION_AVAILABLE:
         raise RuntimeError("Facial recognition modules are unavailable. Please verify server.py is accessible.")
+    # models and the gallery load on first use unless warm_up() already ran
+    ensure_gallery()
 
 # Parse payload as dictionary
 def _parse_payload() -> Dict[str, Any]:
@@ -80,25 +92,35 @@ def _extract_frames(payload: Dict[str, Any]) -> List[str]:
 
     return frames
 
+_ROSTER_LOCK = threading.Lock()
+
+def _ensure_roster() -> None:
+    # without server.py nothing else syncs the roster: do it once, then poll in the background
+    if USER_DIRECTORY.loaded:
+        return
+    with _ROSTER_LOCK:
+        if not USER_DIRECTORY.loaded:
+            USER_DIRECTORY.sync()
+            USER_DIRECTORY.start()
+
 def _lookup_user(name: Optional[str]) -> Optional[Dict[str, Any]]:
+    # served from the locally synced roster; only the first lookup may wait on PHP
     if not name:
         return None
-    try:
-        response = requests.get(f"{PHP_API_URL}/get-state", timeout=5)
-        if response.ok:
-            payload = response.json()
-            if isinstance(payload, dict):
-                for user in payload.get("users", []):
-                    if user.get("name") == name:
-                        return user
-    except Exception as exc: 
-        print(f"[WARN] Failed to look up user details for {name}: {exc}")
-
-    return None
+    if FACIAL_RECOGNITION_AVAILABLE:
+        ensure_gallery()
+    else:
+        _ensure_roster()
+    return USER_DIRECTORY.by_name(name)
 
 def _timestamp() -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S")
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    # pipeline stage timings recorded by server.py live in the same registry
+    return app.response_class(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/", methods=["GET"])
 def service_healthcheck():
     status_code = 200 if FACIAL_RECOGNITION_AVAILABLE else 500
@@ -276,4 +298,6 @@ if __name__ == "__main__":
     print("CORS: Enabled")
     print(f"Recognition stack available: {FACIAL_RECOGNITION_AVAILABLE}")
     print(f"PHP API URL: {PHP_API_URL}")
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    if FACIAL_RECOGNITION_AVAILABLE:
+        warm_up()
+    app.run(host="0.0.0.0", port=5001, debug=os.environ.get("TECHNEST_DEBUG", "0") == "1", use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+
+import requests
+
+
+class SyncResult:
+    """Names of users that appeared, changed or disappeared in one sync."""
+
+    def __init__(self, added=None, updated=None, removed=None):
+        self.added = added or []
+        self.updated = updated or []
+        self.removed = removed or []
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def __repr__(self):
+        return f"SyncResult(added={len(self.added)}, updated={len(self.updated)}, removed={len(self.removed)})"
+
+
+def _user_rev(user):
+    return user.get("rev") or hashlib.md5(json.dumps(user, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class UserDirectory:
+    """Local copy of the PHP roster, indexed by name and id.
+
+    ``sync()`` polls ``/get-users`` with the last seen version as an ETag, so an
+    unchanged roster costs one empty 304. When the endpoint is missing it falls
+    back to the full ``/get-state`` payload. Lookups (``by_name``/``by_id``)
+    only read the local copy and never touch the network; ``start()`` keeps it
+    fresh from a background thread.
+    """
+
+    def __init__(self, api_url, poll_interval=5.0, timeout=5):
+        self.api_url = api_url
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.version = None
+        self.loaded = False
+        self._by_name = {}
+        self._by_id = {}
+        self._sync_lock = threading.Lock()
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def users(self):
+        return list(self._by_id.values())
+
+    def by_name(self, name):
+        return self._by_name.get(name)
+
+    def by_id(self, user_id):
+        return self._by_id.get(str(user_id))
+
+    def _fetch(self):
+        """Returns (version, users), (version, None) when unchanged, or None on failure."""
+        headers = {"If-None-Match": f'"{self.version}"'} if self.version else {}
+        resp = self._session.get(f"{self.api_url}/get-users", headers=headers, timeout=self.timeout)
+        if resp.status_code == 304:
+            return self.version, None
+        if resp.status_code == 404:
+            # older PHP backend without get-users: use the full state dump
+            resp = self._session.get(f"{self.api_url}/get-state", timeout=self.timeout)
+        if not resp.ok:
+            print(f"[SYNC] PHP fetch failed: {resp.status_code}")
+            return None
+        payload = resp.json()
+        users = payload.get("users", []) if isinstance(payload, dict) else []
+        version = payload.get("version") if isinstance(payload, dict) else None
+        return version, users
+
+    def sync(self):
+        """Poll PHP once. Returns a SyncResult (empty when unchanged), or None if the request failed."""
+        with self._sync_lock:
+            try:
+                fetched = self._fetch()
+            except Exception as e:
+                print(f"[SYNC ERROR] {e}")
+                return None
+            if fetched is None:
+                return None
+            version, users = fetched
+            if users is None:
+                return SyncResult()
+
+            by_id, by_name = {}, {}
+            for user in users:
+                user = {k: v for k, v in user.items() if k != "password"}
+                user["rev"] = _user_rev(user)
+                uid = user.get("id") or user.get("user_id") or f"name:{user.get('name')}"
+                by_id[str(uid)] = user
+                if user.get("name"):
+                    by_name[user["name"]] = user
+
+            old = self._by_id
+            result = SyncResult(
+                added=[u.get("name") for k, u in by_id.items() if k not in old],
+                updated=[u.get("name") for k, u in by_id.items() if k in old and old[k]["rev"] != u["rev"]],
+                removed=[u.get("name") for k, u in old.items() if k not in by_id],
+            )
+            # swap whole dicts so concurrent lookups never see a half-built index
+            self._by_id, self._by_name = by_id, by_name
+            self.version = version
+            self.loaded = True
+            return result
+
+    def start(self, on_change=None):
+        """Poll every ``poll_interval`` seconds in a daemon thread; ``on_change(result)`` fires on changes."""
+        if self._thread is not None or self.poll_interval <= 0:
+            return
+
+        def _loop():
+            while not self._stop.wait(self.poll_interval):
+                result = self.sync()
+                if result and on_change is not None:
+                    print(f"[SYNC] Roster changed: {result}")
+                    try:
+                        on_change(result)
+                    except Exception as e:
+                        print(f"[SYNC ERROR] Change handler failed: {e}")
+
+        self._thread = threading.Thread(target=_loop, name="user-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -5,5 +5,38 @@ function POST()
   $id = $_POST['id'];
   Database::instance()->query("DELETE FROM `users` WHERE id = ?", [$id]);
 
+  notifyRecognitionServices($id);
+
   return "User successfully removed from database.";
-}
\ No newline at end of file
+}
+
+/**
+ * Drop the user from the live galleries of the Flask server and the
+ * recognize_cli worker. Both are best-effort with short timeouts: whichever is
+ * not running is skipped, and both also pick up deletions on their next roster poll.
+ */
+function notifyRecognitionServices($id)
+{
+  $headers = "Content-Type: application/json\r\n";
+  if (CONFIG['recognitionServiceToken'] !== '') {
+    $headers .= 'X-TechNest-Token: ' . CONFIG['recognitionServiceToken'] . "\r\n";
+  }
+  $context = stream_context_create([
+    'http' => [
+      'method' => 'POST',
+      'header' => $headers,
+      'content' => json_encode(['id' => $id]),
+      'timeout' => 1,
+      'ignore_errors' => true,
+    ]
+  ]);
+  @file_get_contents(rtrim(CONFIG['recognitionServiceUrl'], '/') . '/users/delete', false, $context);
+
+  $socket = @fsockopen('127.0.0.1', CONFIG['recognitionWorkerPort'], $errno, $errstr, 0.5);
+  if ($socket) {
+    stream_set_timeout($socket, 1);
+    fwrite($socket, json_encode(['op' => 'remove', 'id' => $id]) . "\n");
+    fgets($socket);
+    fclose($socket);
+  }
+}
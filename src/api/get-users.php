@@ -0,0 +1,33 @@
+<?php
+
+/**
+ * Lightweight roster for the recognition service.
+ *
+ * Each user carries a `rev` hash of its fields so the client can tell exactly
+ * which users changed, and the whole list is tagged with a `version` that is
+ * also sent as the ETag. A client that sends the version back (If-None-Match or
+ * ?version=) gets an empty 304 while nothing has changed.
+ */
+function GET()
+{
+  $users = Database::instance()->query(
+    "SELECT id, name, role, dept, username, photo FROM users ORDER BY id DESC",
+    []
+  )->fetchEntireList();
+
+  foreach ($users as &$user) {
+    $user['rev'] = md5(json_encode($user));
+  }
+  unset($user);
+
+  $version = md5(json_encode(array_column($users, 'rev', 'id')));
+  header('ETag: "' . $version . '"');
+
+  $known = trim($_SERVER['HTTP_IF_NONE_MATCH'] ?? ($_GET['version'] ?? ''), '"');
+  if ($known === $version) {
+    http_response_code(304);
+    return '';
+  }
+
+  return json(["version" => $version, "users" => $users]);
+}